@@ -0,0 +1,173 @@
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from mono_cracker_improved import (ALPHABET, NgramScorer, ngram_source, ngram_weights_for_length, blend_orders,
+                                   load_ngram_scorer, restart_seeds, iter_restarts, mapping_to_key_string)
+
+# Batch front-end for mono_cracker_improved: reads many substitution ciphertexts
+# (plain lines or JSONL) from a file or stdin, cracks them on a process pool and
+# writes one JSON result per line, in completion order.
+#
+#   python batch_cracker.py intercepts.jsonl -o results.jsonl --workers 16
+#   cat intercepts.txt | python batch_cracker.py - --restarts 10
+
+NGRAM_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# --------------------------- Input ---------------------------
+def read_ciphertexts(stream):
+    """Yield (id, ciphertext, error) per non-empty line.
+
+    A line is either raw ciphertext or a JSON object with a "ciphertext" field and
+    an optional "id"; lines without an id are numbered from 1. A malformed JSON
+    line yields ciphertext None and an error message instead of ending the input.
+    """
+    for n, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if not line.startswith('{'):
+            yield n, line, None
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield n, None, f'line {n}: invalid JSON ({e})'
+            continue
+        item_id = item.get('id', n) if isinstance(item, dict) else n
+        ciphertext = item.get('ciphertext') if isinstance(item, dict) else None
+        if not isinstance(ciphertext, str):
+            yield item_id, None, f'line {n}: no "ciphertext" string'
+            continue
+        yield item_id, ciphertext, None
+
+# --------------------------- Workers ---------------------------
+# per-process state, filled in once by _init_worker
+_state = {}
+
+def _init_worker(ngram_dir, restarts, iters_per_restart, seed, delta_scoring):
+    _state['ngram_dir'] = ngram_dir
+    _state['scorers'] = {}
+    _state['restarts'] = restarts
+    _state['iters'] = iters_per_restart
+    _state['seed'] = seed
+    _state['delta_scoring'] = delta_scoring
+
+def crack_one(item_id, ciphertext):
+    """Crack one ciphertext with the worker's scorer; returns a JSON-ready dict."""
+    start = time.perf_counter()
+    ctext = ''.join(c for c in ciphertext.upper() if c in ALPHABET)
+    if len(ctext) < 4:
+        return {'id': item_id, 'error': 'ciphertext has fewer than 4 letters'}
+
+    best_score, best_key, best_plain = float('-inf'), None, None
+    # n-gram blend chosen by length; the compiled tables are memory-mapped, so
+    # every worker shares the same pages and loads each blend only once
+    weights = ngram_weights_for_length(len(ctext), _state['ngram_dir'])
+    blend = tuple(sorted(weights.items()))
+    if blend not in _state['scorers']:
+        _state['scorers'][blend] = load_ngram_scorer(weights, _state['ngram_dir'])
+    qscorer = _state['scorers'][blend]
+
+    seeds = restart_seeds(_state['seed'], _state['restarts'])
+    for _, score, key, plain in iter_restarts(ctext, seeds, _state['iters'], qscorer,
+                                                delta_scoring=_state['delta_scoring']):
+        if key is not None and score > best_score:
+            best_score, best_key, best_plain = score, key, plain
+
+    return {
+        'id': item_id,
+        'key': mapping_to_key_string(best_key),
+        'plaintext': best_plain,
+        'score': round(best_score, 4),
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+# --------------------------- Driver ---------------------------
+def run_batch(items, out, workers=None, restarts=20, iters_per_restart=10000, seed=42, ngram_dir=NGRAM_DIR,
+              delta_scoring=True):
+    """Crack every (id, ciphertext, error) in items, writing JSON lines to out as they finish.
+
+    Only a bounded number of ciphertexts is in flight at once, so arbitrarily
+    long inputs are streamed. Items with an error, and ciphertexts whose
+    cracking raised, get an {"id", "error"} record and the batch goes on.
+    delta_scoring picks the swap-delta scorer (the faster path) over full
+    rescoring. Returns (cracked, errors, elapsed_seconds).
+    """
+    workers = workers or os.cpu_count()
+    # compile the tables the blends use once, before the workers map them
+    for order in blend_orders(ngram_dir):
+        NgramScorer(order, ngram_source(order, ngram_dir))
+
+    start = time.perf_counter()
+    cracked = errors = 0
+    items = iter(items)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(ngram_dir, restarts, iters_per_restart, seed, delta_scoring)) as pool:
+        pending = {}  # future -> item id
+        exhausted = False
+        while pending or not exhausted:
+            # keep every worker busy plus a small queue
+            while not exhausted and len(pending) < 2 * workers:
+                try:
+                    item_id, ciphertext, error = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                if error is not None:
+                    out.write(json.dumps({'id': item_id, 'error': error}) + '\n')
+                    errors += 1
+                    continue
+                pending[pool.submit(crack_one, item_id, ciphertext)] = item_id
+            if not pending:
+                break
+
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                item_id = pending.pop(fut)
+                try:
+                    result = fut.result()
+                except Exception as e:
+                    result = {'id': item_id, 'error': f'{type(e).__name__}: {e}'}
+                out.write(json.dumps(result) + '\n')
+                if 'error' in result:
+                    errors += 1
+                else:
+                    cracked += 1
+            out.flush()
+
+    return cracked, errors, time.perf_counter() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Crack a stream of monoalphabetic substitution ciphertexts.')
+    parser.add_argument('input', nargs='?', default='-', help="file with one ciphertext (or JSON object) per line; '-' for stdin")
+    parser.add_argument('-o', '--output', default='-', help="JSONL results file; '-' for stdout")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--restarts', type=int, default=20)
+    parser.add_argument('--iters', type=int, default=10000, help='iterations per restart')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-delta', dest='delta_scoring', action='store_false',
+                        help='rescore the whole text on every swap instead of the swap-delta scorer')
+    parser.add_argument('--ngram-dir', default=NGRAM_DIR, help='directory holding english_quadgrams.txt (and other orders)')
+    args = parser.parse_args(argv)
+
+    fin = sys.stdin if args.input == '-' else open(args.input, 'r')
+    fout = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        cracked, errors, elapsed = run_batch(read_ciphertexts(fin), fout, args.workers, args.restarts, args.iters,
+                                   args.seed, args.ngram_dir, args.delta_scoring)
+    finally:
+        if fin is not sys.stdin:
+            fin.close()
+        if fout is not sys.stdout:
+            fout.close()
+
+    rate = cracked / elapsed * 60 if elapsed > 0 else 0.0
+    print(f"Cracked {cracked} ciphertexts in {elapsed:.1f}s ({rate:.1f} per minute), {errors} errors", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import resource
+import tracemalloc
+import subprocess
+
+import mono_cracker
+import mono_cracker_improved
+from mono_cracker_improved import ALPHABET, restart_seeds, ngram_weights_for_length, load_ngram_scorer
+
+# Benchmark for the substitution solvers: encrypts windows of a reference corpus
+# under random keys and measures, per solver and ciphertext length, iterations per
+# second, time until a restart ends on the right key, success rate and peak memory.
+# Results are written as JSON so runs of different versions can be compared.
+#
+#   python bench_solvers.py --lengths 100 200 400 --trials 5 -o bench.json
+
+# Default corpus: the opening crawl used in the week 1 notebook.
+DEFAULT_CORPUS = (
+    "ALONGTIMEAGOINAGALAXYFARFARAWAYITISAPERIODOFCIVILWARREBELSPACESHIPSSTRIKINGFROMAHIDDENBASEHAVEWON"
+    "THEIRFIRSTVICTORYAGAINSTTHEEVILGALACTICEMPIREDURINGTHEBATTLEREBELSPIESMANAGEDTOSTEALSECRETPLANSTO"
+    "THEEMPIRESULTIMATEWEAPONTHEDEATHSTARANDSPACESTATIONWITHENOUGHPOWERTODESTROYANENTIREPLANETPURSUEDBY"
+    "THEEMPIRESSINISTERAGENTSPRINCESSLEIARACESHOMEABOARDHERSTARSHIPCUSTODIANOFTHESTOLENPLANSTHATCANSAVE"
+    "HERPEOPLEANDRESTOREFREEDOMTOTHEGALAXY"
+)
+
+# 'improved' runs the n-gram scorer with swap-delta scoring (the default
+# configuration), 'improved_full' the same scorer with full rescoring per swap
+SOLVERS = ('mono_cracker', 'improved', 'improved_full', 'improved_unigram')
+NGRAM_SOLVERS = ('improved', 'improved_full')
+
+NGRAM_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# --------------------------- Workload ---------------------------
+def clean(text):
+    return ''.join(c for c in text.upper() if c in ALPHABET)
+
+def make_case(corpus, length, rng):
+    """Random window of the corpus and its encryption under a random key."""
+    start = rng.randrange(len(corpus) - length + 1)
+    plain = corpus[start:start + length]
+    key = list(ALPHABET)
+    rng.shuffle(key)
+    enc = str.maketrans(ALPHABET, ''.join(key))
+    return plain, plain.translate(enc)
+
+def restart_stream(solver, ctext, seeds, iters_per_restart, qscorer):
+    # (restart, score, key, plain) per restart, sequentially, for the chosen solver
+    if solver == 'mono_cracker':
+        return mono_cracker.iter_restarts(ctext, seeds, iters_per_restart)
+    if solver in NGRAM_SOLVERS:
+        return mono_cracker_improved.iter_restarts(ctext, seeds, iters_per_restart, qscorer,
+                                                   delta_scoring=solver == 'improved')
+    return mono_cracker_improved.iter_restarts(ctext, seeds, iters_per_restart)
+
+# --------------------------- Measurements ---------------------------
+def letter_accuracy(cand, plain):
+    return sum(a == b for a, b in zip(cand or '', plain)) / len(plain)
+
+def run_case(solver, plain, ctext, restarts, iters_per_restart, seed, qscorer, accuracy_threshold):
+    """Run every restart; returns (elapsed, time_to_correct or None, letter accuracy of the best key).
+
+    A key counts as correct once its plaintext matches at least accuracy_threshold
+    of the letters (rare letters seen once or twice are often left swapped).
+    """
+    # mono_cracker minimises D, the improved solver maximises its score
+    better = (lambda a, b: a < b) if solver == 'mono_cracker' else (lambda a, b: a > b)
+    best_score, best_plain = None, None
+    time_to_correct = None
+
+    start = time.perf_counter()
+    for _, score, key, cand in restart_stream(solver, ctext, restart_seeds(seed, restarts), iters_per_restart, qscorer):
+        if key is None:
+            continue
+        if time_to_correct is None and letter_accuracy(cand, plain) >= accuracy_threshold:
+            time_to_correct = time.perf_counter() - start
+        if best_score is None or better(score, best_score):
+            best_score, best_plain = score, cand
+    elapsed = time.perf_counter() - start
+
+    return elapsed, time_to_correct, letter_accuracy(best_plain, plain)
+
+def peak_memory(solver, ctext, iters_per_restart, qscorer):
+    # Python heap peak of one restart (tracemalloc is slow, so it is measured apart)
+    tracemalloc.start()
+    try:
+        for _ in restart_stream(solver, ctext, restart_seeds(0, 1), iters_per_restart, qscorer):
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def git_revision():
+    try:
+        out = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+def benchmark(corpus, lengths, trials=5, restarts=5, iters_per_restart=5000, seed=0, solvers=SOLVERS,
+              accuracy_threshold=0.98):
+    """Run every solver on trials random-key ciphertexts per length; returns a JSON-ready dict."""
+    results = []
+    for length in lengths:
+        if length > len(corpus):
+            print(f"Skipping length {length}: corpus has only {len(corpus)} letters", file=sys.stderr)
+            continue
+
+        # same ciphertexts for every solver
+        rng = random.Random(f"{seed}:{length}")
+        cases = [make_case(corpus, length, rng) for _ in range(trials)]
+        qscorer = load_ngram_scorer(ngram_weights_for_length(length, NGRAM_DIR), NGRAM_DIR)
+
+        for solver in solvers:
+            scorer = qscorer if solver in NGRAM_SOLVERS else None
+            times, to_correct, accuracies = [], [], []
+            for t, (plain, ctext) in enumerate(cases):
+                elapsed, ttc, acc = run_case(solver, plain, ctext, restarts, iters_per_restart, seed + t, scorer,
+                                             accuracy_threshold)
+                times.append(elapsed)
+                accuracies.append(acc)
+                if ttc is not None:
+                    to_correct.append(ttc)
+
+            successes = sum(a >= accuracy_threshold for a in accuracies)
+            total_iters = trials * restarts * iters_per_restart
+            row = {
+                'solver': solver,
+                'length': length,
+                'trials': trials,
+                'success_rate': successes / trials,
+                'mean_letter_accuracy': sum(accuracies) / trials,
+                'mean_time_to_correct_s': sum(to_correct) / len(to_correct) if to_correct else None,
+                'correct_runs': len(to_correct),
+                'iters_per_sec': total_iters / sum(times) if sum(times) > 0 else None,
+                'mean_run_s': sum(times) / trials,
+                'peak_heap_bytes': peak_memory(solver, cases[0][1], iters_per_restart, scorer),
+            }
+            results.append(row)
+            print(f"{solver:17s} len={length:5d} success={row['success_rate']:.2f} "
+                  f"it/s={row['iters_per_sec']:.0f}", file=sys.stderr)
+
+    return {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'params': {'trials': trials, 'restarts': restarts, 'iters_per_restart': iters_per_restart,
+                   'seed': seed, 'corpus_letters': len(corpus), 'accuracy_threshold': accuracy_threshold},
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'results': results,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the monoalphabetic substitution solvers.')
+    parser.add_argument('--corpus', help='reference English text (default: built-in sample)')
+    parser.add_argument('--lengths', type=int, nargs='+', default=[100, 200, 400])
+    parser.add_argument('--trials', type=int, default=5, help='ciphertexts per length')
+    parser.add_argument('--restarts', type=int, default=5)
+    parser.add_argument('--iters', type=int, default=5000, help='iterations per restart')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--solvers', nargs='+', choices=SOLVERS, default=list(SOLVERS))
+    parser.add_argument('--accuracy', type=float, default=0.98, help='letter accuracy that counts as a correct key')
+    parser.add_argument('-o', '--output', default='-', help="JSON output file; '-' for stdout")
+    args = parser.parse_args(argv)
+
+    if args.corpus:
+        with open(args.corpus, 'r') as f:
+            corpus = clean(f.read())
+    else:
+        corpus = DEFAULT_CORPUS
+
+    report = benchmark(corpus, args.lengths, args.trials, args.restarts, args.iters, args.seed, args.solvers,
+                       args.accuracy)
+    text = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(text)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,8 @@
+import os
 import string
-import random
-import math
-from collections import Counter
+
+import mono_cracker_improved
+from mono_cracker_improved import Key, restart_seeds
 
 # --------------------------- Provided helpers ---------------------------
 ALPHABET = string.ascii_uppercase
@@ -34,12 +35,16 @@ def D(text, ref):
 
 # --------------------------- Utilities ---------------------------
 def apply_key_mapping(mapping, text):
-    # mapping: dict ciphertext_letter -> plaintext_letter
+    # mapping: dict ciphertext_letter -> plaintext_letter, or a Key
+    if isinstance(mapping, Key):
+        return text.translate(str.maketrans(ALPHABET, mapping.key_string()))
     return ''.join(mapping.get(c, '?') for c in text)
 
 
 def mapping_to_key_string(mapping):
     # produce 26-char key string where position i is mapping of ciphertext letter chr(65+i)
+    if isinstance(mapping, Key):
+        return mapping.key_string()
     return ''.join(mapping.get(chr(65 + i), '?') for i in range(26))
 
 
@@ -56,75 +61,48 @@ def initial_key_by_frequency_using_stats(ctext):
 
 # convenience: convert mapping (ct->pt) to inverse (pt->ct)
 def invert_mapping(mapping):
+    if isinstance(mapping, Key):
+        return mapping.inverse()
     inv = {v: k for k, v in mapping.items()}
     return inv
 
 # --------------------------- Solver ---------------------------
 
-def solve(ctext, restarts=50, iters_per_restart=5000, seed=None):
-    if seed is not None:
-        random.seed(seed)
+def iter_restarts(ctext, seeds, iters_per_restart, workers=1):
+    """Yield (restart, D, mapping, plain) for every restart, in completion order.
+
+    The restarts are mono_cracker_improved's unigram annealing runs, which
+    maximise -D; their scores are turned back into D here. Closing the
+    generator early cancels the restarts that have not finished yet.
+    """
+    results = mono_cracker_improved.iter_restarts(ctext, seeds, iters_per_restart, workers=workers)
+    try:
+        for r, score, mapping, plain in results:
+            yield r, -score, mapping, plain
+    finally:
+        results.close()
+
 
+def solve(ctext, restarts=50, iters_per_restart=5000, seed=None, workers=1, target_score=None):
     best_score = float('inf')
     best_mapping = None
     best_plain = None
 
-    for r in range(restarts):
-        print(f"Restart {r + 1}/{restarts}")
-        
-        # initial mapping and score using stats-based frequency mapping
-        mapping = initial_key_by_frequency_using_stats(ctext)
-        plain = apply_key_mapping(mapping, ctext)
-        score = D(plain, ESTATS)
-
-        # simulated annealing schedule
-        T0 = max(0.5, score * 10)
-        T = T0
-        decay = 0.9995
-
-        for it in range(iters_per_restart):
-            a, b = random.sample(ALPHABET, 2)
-            ca = cb = None
-            for k, v in mapping.items():
-                if v == a:
-                    ca = k
-                elif v == b:
-                    cb = k
-                if ca and cb:
-                    break
-            if ca is None or cb is None:
-                continue
-
-            mapping[ca], mapping[cb] = mapping[cb], mapping[ca]
-            new_plain = apply_key_mapping(mapping, ctext)
-            new_score = D(new_plain, ESTATS)
-            delta = new_score - score
-
-            if delta < 0 or random.random() < math.exp(-delta / max(T, 1e-12)):
-                plain = new_plain
-                score = new_score
-                if score < best_score:
-                    best_score = score
-                    best_mapping = mapping.copy()
-                    best_plain = plain
-            else:
-                mapping[ca], mapping[cb] = mapping[cb], mapping[ca]
-
-            T *= decay
-
-        # small random shake
-        for _ in range(10):
-            x, y = random.sample(ALPHABET, 2)
-            ca = cb = None
-            for k, v in mapping.items():
-                if v == x:
-                    ca = k
-                elif v == y:
-                    cb = k
-                if ca and cb:
-                    break
-            if ca and cb:
-                mapping[ca], mapping[cb] = mapping[cb], mapping[ca]
+    # every restart gets its own seed, so results do not depend on the number of workers
+    seeds = restart_seeds(seed, restarts)
+    results = iter_restarts(ctext, seeds, iters_per_restart, workers)
+    for done, (r, score, mapping, plain) in enumerate(results, 1):
+        print(f"Restart {r + 1}/{restarts} done ({done}/{restarts}): D {score:.8f}")
+        if mapping is not None and score < best_score:
+            best_score = score
+            best_mapping = mapping
+            best_plain = plain
+
+        # lower D is better
+        if target_score is not None and best_score <= target_score:
+            print(f"Target D {target_score:.8f} reached, cancelling remaining restarts")
+            results.close()
+            break
 
     return best_mapping, best_plain, best_score
 
@@ -149,7 +127,7 @@ if __name__ == '__main__':
     C = ''.join([c for c in CIPHERTEXT if c in ALPHABET])
 
     print('Running solver...')
-    mapping, plain, score = solve(C, restarts=50, iters_per_restart=10000, seed=42)
+    mapping, plain, score = solve(C, restarts=50, iters_per_restart=10000, seed=42, workers=os.cpu_count())
 
     if mapping is None:
         print('No solution found')
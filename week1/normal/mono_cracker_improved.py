@@ -1,7 +1,15 @@
+import os
 import string
 import random
 import math
-from collections import Counter
+import functools
+import multiprocessing
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from word_patterns import load_pattern_index, fragment_cribs, sample_partial_key
 
 # --------------------------- Provided helpers ---------------------------
 ALPHABET = string.ascii_uppercase
@@ -32,6 +40,37 @@ def D(text, ref):
     p = stats(text)
     return sum((ref[i] - p[i]) ** 2 for i in range(26))
 
+# --------------------------- Unigram Swap Scoring ---------------------------
+class UnigramSwapScorer:
+    """-D(plaintext, ref) with O(1) updates for a two-letter key swap.
+
+    The ciphertext histogram is counted once. Under a key, plaintext letter fwd[c]
+    has the frequency of ciphertext letter c, so a swap only exchanges two entries
+    of the frequency vector and its effect on D has a closed form. D is negated
+    so that higher is better, as with the n-gram scores (mono_cracker reports D
+    itself). Same reset/delta/commit interface as SwapDeltaScorer.
+    """
+    def __init__(self, ctext, ref=ESTATS):
+        counts = Counter(ctext)
+        n = len(ctext)
+        self.freq = [counts[ch] / n if n else 0.0 for ch in ALPHABET]
+        self.ref = ref
+
+    def reset(self, key):
+        p = [0.0] * 26
+        for c, pt in enumerate(key.fwd):
+            p[pt] = self.freq[c]
+        return -sum((self.ref[i] - p[i]) ** 2 for i in range(26))
+
+    def delta(self, key, ca, cb):
+        a, b = key.fwd[ca], key.fwd[cb]
+        fa, fb, ra, rb = self.freq[ca], self.freq[cb], self.ref[a], self.ref[b]
+        # plaintext a goes from frequency fa to fb and b from fb to fa
+        return (ra - fa) ** 2 + (rb - fb) ** 2 - (ra - fb) ** 2 - (rb - fa) ** 2
+
+    def commit(self):
+        pass
+
 # --------------------------- Quadgram Scoring ---------------------------
 class QuadgramScorer:
     def __init__(self, quadgram_file='english_quadgrams.txt'):
@@ -63,13 +102,429 @@ class QuadgramScorer:
             score += self.quadgrams.get(quad, self.floor)
         return score
 
+# --------------------------- Dense N-gram Scoring ---------------------------
+NGRAM_NAMES = {1: 'monograms', 2: 'bigrams', 3: 'trigrams', 4: 'quadgrams', 5: 'quintgrams'}
+
+def encode_text(text):
+    """Encode uppercase A-Z text as a uint8 array of letter codes 0..25."""
+    return np.frombuffer(text.encode('ascii'), dtype=np.uint8) - 65
+
+def ngram_indices(codes, n):
+    # flat index into a 26^n table for every n-gram window (last axis is the text)
+    codes = np.asarray(codes, dtype=np.intp)
+    m = codes.shape[-1] - n + 1
+    idx = codes[..., :m]
+    for j in range(1, n):
+        idx = idx * 26 + codes[..., j:j + m]
+    return idx
+
+def ngram_source(order, directory='.'):
+    """Counts file an order-n table is built from.
+
+    english_<name>.txt when present; orders below 4 otherwise fall back to the
+    quadgram counts, which are marginalised down to the requested order.
+    """
+    own = os.path.join(directory, f'english_{NGRAM_NAMES[order]}.txt')
+    if os.path.exists(own) or order > 4:
+        return own
+    return os.path.join(directory, 'english_quadgrams.txt')
+
+def compiled_ngram_path(order, ngram_file):
+    # english_trigrams.txt -> english_trigrams.npy; english_quadgrams.txt -> english_quadgrams.trigrams.npy
+    stem = os.path.splitext(ngram_file)[0]
+    if os.path.basename(ngram_file) == f'english_{NGRAM_NAMES[order]}.txt':
+        return stem + '.npy'
+    return f"{stem}.{NGRAM_NAMES[order]}.npy"
+
+def compile_ngrams(order, ngram_file, compiled_file):
+    """Write the order-n log-probability table built from ngram_file as a .npy file.
+
+    The file holds the 26^n float32 table followed by the floor value, so it can
+    be memory-mapped by every process instead of re-parsing the text file.
+    """
+    grams = []
+    counts = []
+    with open(ngram_file, 'r') as f:
+        for line in f:
+            parts = line.strip().split()
+            if len(parts) == 2:
+                grams.append(parts[0].upper())
+                counts.append(int(parts[1]))
+
+    file_order = len(grams[0])
+    if file_order < order:
+        raise ValueError(f"{ngram_file} holds order-{file_order} counts, cannot build order {order}")
+    dense = np.zeros(26 ** file_order, dtype=np.float64)
+    dense[ngram_indices(encode_text(''.join(grams)).reshape(-1, file_order), file_order)[:, 0]] = counts
+    if file_order > order:
+        # count of a shorter n-gram = sum of the counts of the longer ones it starts
+        dense = dense.reshape(26 ** order, -1).sum(axis=1)
+
+    total = dense.sum()
+    floor = math.log10(0.01 / total)
+    table = np.full(26 ** order + 1, floor, dtype=np.float32)
+    seen = np.flatnonzero(dense)
+    table[seen] = np.log10(dense[seen] / total)
+
+    # write to a temporary file first so concurrent readers never see a partial table
+    tmp = f"{compiled_file}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        np.save(f, table)
+    os.replace(tmp, compiled_file)
+    return compiled_file
+
+def load_ngram_table(order, ngram_file, compiled_file=None):
+    """Memory-map the compiled order-n table, (re)building it when ngram_file is newer."""
+    if compiled_file is None:
+        compiled_file = compiled_ngram_path(order, ngram_file)
+    if os.path.exists(ngram_file):
+        if not os.path.exists(compiled_file) or os.stat(compiled_file).st_mtime_ns < os.stat(ngram_file).st_mtime_ns:
+            compile_ngrams(order, ngram_file, compiled_file)
+    elif not os.path.exists(compiled_file):
+        raise FileNotFoundError(ngram_file)
+    return np.load(compiled_file, mmap_mode='r')
+
+class NgramScorer:
+    """Log-probability scorer of one n-gram order (1..5) over a dense 26^n float32 table.
+
+    The table is memory-mapped from a compiled .npy next to its counts file, so
+    loading takes milliseconds and worker processes share the same pages.
+    """
+    def __init__(self, order=4, ngram_file=None, compiled_file=None):
+        if order not in NGRAM_NAMES:
+            raise ValueError(f"n-gram order must be 1..5, got {order}")
+        if ngram_file is None:
+            ngram_file = ngram_source(order)
+        self.order = order
+        self.ngram_file = ngram_file
+        self.compiled_file = compiled_file
+        data = load_ngram_table(order, ngram_file, compiled_file)
+        self.table = data[:-1]
+        self.floor = float(data[-1])
+
+    # pickle by path so worker processes re-map the file instead of copying the table
+    def __getstate__(self):
+        return {'order': self.order, 'ngram_file': self.ngram_file, 'compiled_file': self.compiled_file}
+
+    def __setstate__(self, state):
+        NgramScorer.__init__(self, state['order'], state['ngram_file'], state['compiled_file'])
+
+    def score(self, text):
+        """Fitness of a str or a 1-D array of letter codes."""
+        codes = encode_text(text) if isinstance(text, str) else text
+        if len(codes) < self.order:
+            return 0.0
+        return float(self.table[ngram_indices(codes, self.order)].sum(dtype=np.float64))
+
+    def score_batch(self, batch):
+        """Fitness of every row of a 2-D array of letter codes (one candidate plaintext per row)."""
+        batch = np.asarray(batch)
+        if batch.shape[-1] < self.order:
+            return np.zeros(batch.shape[:-1])
+        return self.table[ngram_indices(batch, self.order)].sum(axis=-1, dtype=np.float64)
+
+    def score_keys(self, keys, ccodes):
+        """Fitness of many keys at once; keys is (m, 26) with keys[k][c] = plaintext code of c."""
+        return self.score_batch(np.asarray(keys, dtype=np.uint8)[:, ccodes])
+
+class BlendedScorer:
+    """Weighted sum of NgramScorers of different orders, with the NgramScorer interface."""
+    def __init__(self, parts):
+        # parts: list of (weight, NgramScorer)
+        self.parts = list(parts)
+        self.order = max(s.order for _, s in self.parts)
+
+    def score(self, text):
+        codes = encode_text(text) if isinstance(text, str) else text
+        return sum(w * s.score(codes) for w, s in self.parts)
+
+    def score_batch(self, batch):
+        return sum(w * s.score_batch(batch) for w, s in self.parts)
+
+    def score_keys(self, keys, ccodes):
+        return self.score_batch(np.asarray(keys, dtype=np.uint8)[:, ccodes])
+
+SHORT_TEXT = 120   # letters below which trigrams join the quadgrams
+LONG_TEXT = 600    # letters from which quintgrams (when available) join them
+
+def ngram_weights_for_length(length, directory='.'):
+    """Blend of n-gram orders suited to a ciphertext of the given length.
+
+    Short texts have too few windows for order-4 statistics alone, so trigrams
+    are added on top. Long texts add quintgrams, when english_quintgrams.txt is
+    available, to polish the key.
+    """
+    if length < SHORT_TEXT:
+        return {3: 1.0, 4: 1.0}
+    if length >= LONG_TEXT and os.path.exists(ngram_source(5, directory)):
+        return {4: 0.5, 5: 0.5}
+    return {4: 1.0}
+
+def blend_orders(directory='.'):
+    """Every n-gram order ngram_weights_for_length can pick in directory."""
+    return sorted({order for length in (0, SHORT_TEXT, LONG_TEXT) for order in ngram_weights_for_length(length, directory)})
+
+def load_ngram_scorer(weights, directory='.'):
+    """NgramScorer for a single order, BlendedScorer for several; weights is {order: weight}."""
+    parts = [(w, NgramScorer(order, ngram_source(order, directory))) for order, w in sorted(weights.items()) if w]
+    if len(parts) == 1 and parts[0][0] == 1:
+        return parts[0][1]
+    return BlendedScorer(parts)
+
+# --------------------------- Swap-delta Scoring ---------------------------
+class _DenseWindows:
+    """Table indices and cached scores of the windows of one dense n-gram table.
+
+    A window's index is sum_j fwd[c_j] * 26^(n-1-j), so with weights[c] the sum
+    of 26^(n-1-j) over the positions j holding letter c, swapping the plaintext
+    of ca and cb moves every index by (fwd[cb] - fwd[ca]) * (weights[ca] - weights[cb]).
+    delta() applies that to the touched windows instead of re-encoding them. The
+    touched windows and their weight differences are cached per unordered
+    letter pair.
+    """
+    def __init__(self, codes, table, n, weight):
+        self.table, self.n, self.weight = table, n, weight
+        nwin = max(len(codes) - n + 1, 0)
+        self.weights = np.zeros((26, nwin), dtype=np.int32)
+        for j in range(n):
+            self.weights[codes[j:j + nwin], np.arange(nwin)] += 26 ** (n - 1 - j)
+        self.cwin = codes[np.arange(nwin)[:, None] + np.arange(n)]
+        self.pairs = {}
+        self.idx = None
+        self.wscores = None
+        self.pending = None
+
+    def reset(self, fwd):
+        self.idx = ngram_indices(fwd[self.cwin], self.n)[:, 0]
+        self.wscores = self.table[self.idx].astype(np.float64)
+        return self.weight * float(self.wscores.sum())
+
+    def touched(self, ca, cb):
+        """Windows containing ca or cb (exactly those where their weights differ) and the differences."""
+        entry = self.pairs.get((ca, cb))
+        if entry is None:
+            wdiff = self.weights[ca] - self.weights[cb]
+            touched = np.flatnonzero(wdiff)
+            entry = self.pairs[ca, cb] = (touched, wdiff[touched])
+        return entry
+
+    def delta(self, shift, ca, cb):
+        # (ca, cb) and (cb, ca) flip the signs of both shift and the weight difference
+        if ca > cb:
+            ca, cb, shift = cb, ca, -shift
+        touched, wdiff = self.touched(ca, cb)
+        idx = self.idx[touched] + shift * wdiff
+        s = self.table[idx]
+        self.pending = (touched, idx, s)
+        return self.weight * float(s.sum(dtype=np.float64) - self.wscores[touched].sum())
+
+    def commit(self):
+        touched, idx, s = self.pending
+        self.idx[touched] = idx
+        self.wscores[touched] = s
+        self.pending = None
+
+class SwapDeltaScorer:
+    """Rescores only the n-gram windows touched by a two-letter key swap.
+
+    Keeps the score of every window under the current Key: reset() sets the key,
+    delta() scores a candidate swap and commit() adopts the last candidate.
+    Works with QuadgramScorer, NgramScorer and BlendedScorer.
+    """
+    def __init__(self, qscorer, ctext):
+        self.qscorer = qscorer
+
+        # dense backends: one window index per n-gram order
+        self.dense = isinstance(qscorer, (NgramScorer, BlendedScorer))
+        if self.dense:
+            parts = qscorer.parts if isinstance(qscorer, BlendedScorer) else [(1.0, qscorer)]
+            codes = encode_text(ctext)
+            self.orders = [_DenseWindows(codes, s.table, s.order, w) for w, s in parts]
+            return
+
+        self.quads = [ctext[i:i+4] for i in range(len(ctext) - 3)]
+
+        # per ciphertext letter code: start positions of the windows that contain it
+        self.windows = [[] for _ in range(26)]
+        for i, quad in enumerate(self.quads):
+            for c in set(quad):
+                self.windows[ord(c) - 65].append(i)
+
+        self.wscores = None
+        self.pending = None
+
+    def reset(self, key):
+        """Score every window under key; returns the total score."""
+        if self.dense:
+            fwd = np.array(key.fwd, dtype=np.uint8)
+            return sum(o.reset(fwd) for o in self.orders)
+
+        get, floor = self.qscorer.quadgrams.get, self.qscorer.floor
+        table = str.maketrans(ALPHABET, key.key_string())
+        self.wscores = [get(quad.translate(table), floor) for quad in self.quads]
+        return sum(self.wscores)
+
+    def delta(self, key, ca, cb):
+        """Score change of swapping the plaintext of ciphertext codes ca and cb (key is left untouched)."""
+        if self.dense:
+            shift = key.fwd[cb] - key.fwd[ca]
+            return sum(o.delta(shift, ca, cb) for o in self.orders)
+
+        get, floor, quads, wscores = self.qscorer.quadgrams.get, self.qscorer.floor, self.quads, self.wscores
+        new = str.maketrans(ALPHABET, key.key_string())
+        new[65 + ca], new[65 + cb] = new[65 + cb], new[65 + ca]
+        la = chr(65 + ca)
+
+        changed = []
+        d = 0.0
+        for i in self.windows[ca]:
+            s = get(quads[i].translate(new), floor)
+            changed.append((i, s))
+            d += s - wscores[i]
+        for i in self.windows[cb]:
+            quad = quads[i]
+            if la in quad:
+                continue  # already counted with ca
+            s = get(quad.translate(new), floor)
+            changed.append((i, s))
+            d += s - wscores[i]
+        self.pending = changed
+        return d
+
+    def commit(self):
+        """Adopt the swap scored by the last delta() call."""
+        if self.dense:
+            for o in self.orders:
+                o.commit()
+            return
+        wscores = self.wscores
+        for i, s in self.pending:
+            wscores[i] = s
+        self.pending = None
+
+# --------------------------- Score Cache ---------------------------
+class ScoreCache:
+    """Bounded LRU map from key fingerprint to score, with hit/miss counters.
+
+    Late in a restart the annealer keeps proposing swaps it has already scored
+    from the same key, and restarts converge to neighbouring keys, so one cache
+    is shared by all the restarts of a process. Scores are only valid for one
+    ciphertext and scorer.
+    """
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._scores = OrderedDict()
+
+    @staticmethod
+    def fingerprint(key):
+        return bytes(key.fwd)
+
+    def get(self, key):
+        fp = self.fingerprint(key)
+        score = self._scores.get(fp)
+        if score is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._scores.move_to_end(fp)
+        return score
+
+    def put(self, key, score):
+        fp = self.fingerprint(key)
+        self._scores[fp] = score
+        self._scores.move_to_end(fp)
+        if len(self._scores) > self.maxsize:
+            self._scores.popitem(last=False)
+
+    def __len__(self):
+        return len(self._scores)
+
+    def __repr__(self):
+        return f"ScoreCache({len(self)}/{self.maxsize}, hits={self.hits}, misses={self.misses})"
+
+# --------------------------- Key Representation ---------------------------
+class Key:
+    """Substitution key as two 26-entry permutations of letter codes 0..25.
+
+    fwd[c] is the plaintext code of ciphertext code c and inv[p] its inverse,
+    so swaps, reverts and copies are O(1) and never scan a dict.
+    """
+    __slots__ = ('fwd', 'inv')
+
+    def __init__(self, fwd):
+        self.fwd = list(fwd)
+        self.inv = [0] * 26
+        for c, p in enumerate(self.fwd):
+            self.inv[p] = c
+
+    @classmethod
+    def from_mapping(cls, mapping):
+        """Build from a dict ciphertext_letter -> plaintext_letter covering A..Z."""
+        return cls(ord(mapping[ch]) - 65 for ch in ALPHABET)
+
+    def swap_plain(self, a, b):
+        """Swap the ciphertext letters of plaintext codes a and b; returns their ciphertext codes."""
+        fwd, inv = self.fwd, self.inv
+        ca, cb = inv[a], inv[b]
+        fwd[ca], fwd[cb] = b, a
+        inv[a], inv[b] = cb, ca
+        return ca, cb
+
+    def swap(self, ca, cb):
+        """Swap the plaintext letters of ciphertext codes ca and cb (its own revert)."""
+        fwd, inv = self.fwd, self.inv
+        fwd[ca], fwd[cb] = fwd[cb], fwd[ca]
+        inv[fwd[ca]], inv[fwd[cb]] = ca, cb
+
+    def copy(self):
+        key = Key.__new__(Key)
+        key.fwd = self.fwd[:]
+        key.inv = self.inv[:]
+        return key
+
+    def key_string(self):
+        # position i is the plaintext letter of ciphertext letter chr(65+i)
+        return ''.join(chr(65 + p) for p in self.fwd)
+
+    def to_mapping(self):
+        return {chr(65 + c): chr(65 + p) for c, p in enumerate(self.fwd)}
+
+    def inverse(self):
+        return Key(self.inv)
+
+    # dict-style lookups so code written for mappings keeps working
+    def get(self, ch, default=None):
+        c = ord(ch) - 65
+        return chr(65 + self.fwd[c]) if 0 <= c < 26 and len(ch) == 1 else default
+
+    def __getitem__(self, ch):
+        p = self.get(ch)
+        if p is None:
+            raise KeyError(ch)
+        return p
+
+    def __eq__(self, other):
+        return isinstance(other, Key) and self.fwd == other.fwd
+
+    def __hash__(self):
+        return hash(tuple(self.fwd))
+
+    def __repr__(self):
+        return f"Key('{self.key_string()}')"
+
 # --------------------------- Utilities ---------------------------
 def apply_key_mapping(mapping, text):
-    # mapping: dict ciphertext_letter -> plaintext_letter
+    # mapping: dict ciphertext_letter -> plaintext_letter, or a Key
+    if isinstance(mapping, Key):
+        return text.translate(str.maketrans(ALPHABET, mapping.key_string()))
     return ''.join(mapping.get(c, '?') for c in text)
 
 def mapping_to_key_string(mapping):
     # produce 26-char key string where position i is mapping of ciphertext letter chr(65+i)
+    if isinstance(mapping, Key):
+        return mapping.key_string()
     return ''.join(mapping.get(chr(65 + i), '?') for i in range(26))
 
 # build initial mapping by mapping ciphertext letter frequencies (from stats) to ESTATS
@@ -82,105 +537,283 @@ def initial_key_by_frequency_using_stats(ctext):
         mapping[ch] = eng_sorted[i]
     return mapping
 
+# frequency key as a Key, computed once per ciphertext; callers copy it
+@functools.lru_cache(maxsize=32)
+def initial_key(ctext):
+    return Key.from_mapping(initial_key_by_frequency_using_stats(ctext))
+
+def seeded_key(ctext, cribs, rng):
+    """Start key from a random partial key of dictionary cribs (see word_patterns.fragment_cribs).
+
+    The letters the cribs leave free are filled in by frequency rank, as in
+    initial_key_by_frequency_using_stats; without a usable crib this is the
+    frequency key.
+    """
+    partial = sample_partial_key(cribs, rng)
+    if not partial:
+        return initial_key(ctext).copy()
+    p = stats(ctext)
+    free_cipher = sorted((c for c in ALPHABET if c not in partial), key=lambda c: -p[ord(c) - 65])
+    used = set(partial.values())
+    free_plain = sorted((c for c in ALPHABET if c not in used), key=lambda c: -ESTATS[ord(c) - 65])
+    mapping = dict(partial)
+    mapping.update(zip(free_cipher, free_plain))
+    return Key.from_mapping(mapping)
+
 # convenience: convert mapping (ct->pt) to inverse (pt->ct)
 def invert_mapping(mapping):
+    if isinstance(mapping, Key):
+        return mapping.inverse()
     inv = {v: k for k, v in mapping.items()}
     return inv
 
 # --------------------------- Solver ---------------------------
-def solve(ctext, restarts=50, iters_per_restart=5000, seed=None, use_quadgrams=True):
-    if seed is not None:
-        random.seed(seed)
+def restart_seeds(seed, restarts):
+    """One independent seed per restart, all derived from seed (fresh entropy if seed is None)."""
+    rng = random.Random(seed)
+    return [rng.getrandbits(64) for _ in range(restarts)]
+
+# adaptive schedule: target acceptance rate of worsening moves, decaying from
+# ACCEPT_START to ACCEPT_END over the first ADAPT_ITERS iterations of a restart
+ACCEPT_START = 0.3
+ACCEPT_END = 0.001
+ADAPT_ITERS = 4000
+ADAPT_BLOCK = 200
+
+# crib-seeded start keys drawn per restart; the best scoring one is annealed
+SEED_TRIES = 16
+
+def run_restart(ctext, iters_per_restart, rseed, qscorer=None, dscorer=None, stop=None, schedule='fixed', patience=None,
+                cribs=None, cache=None):
+    """One annealing run from the frequency key, driven by its own RNG.
+
+    Returns (best_score, best_mapping, best_plain) of this restart, with the
+    mapping as a Key. stop is an optional Event; the run ends early once set.
+
+    schedule='fixed' cools geometrically from T0; 'adaptive' rescales T every
+    ADAPT_BLOCK iterations so the share of accepted worsening moves follows a
+    target that decays from ACCEPT_START to ACCEPT_END over ADAPT_ITERS. With
+    patience set, the restart ends once its best score has not improved for
+    that many iterations. With cribs (see word_patterns.fragment_cribs) the run
+    starts from seeded_key instead, so every restart starts somewhere else.
+    cache is an optional ScoreCache for the full-rescoring path (no dscorer).
+    """
+    rng = random.Random(rseed)
+    use_quadgrams = qscorer is not None
+
+    best_score = float('-inf')
+    best_mapping = None
+    best_plain = None
+
+    def full_score(key):
+        if dscorer is not None:
+            return dscorer.reset(key)
+        score = cache.get(key) if cache is not None else None
+        if score is None:
+            plain = apply_key_mapping(key, ctext)
+            score = qscorer.score(plain) if use_quadgrams else -D(plain, ESTATS)
+            if cache is not None:
+                cache.put(key, score)
+        return score
 
-    # initialize quadgram scorer if available
-    qscorer = None
+    # initial key and score using stats-based frequency mapping, or the best of
+    # SEED_TRIES keys seeded from dictionary cribs
+    if cribs:
+        key = max((seeded_key(ctext, cribs, rng) for _ in range(SEED_TRIES)), key=full_score)
+    else:
+        key = initial_key(ctext).copy()
+    plain = apply_key_mapping(key, ctext)
+    score = full_score(key)
+
+    # simulated annealing schedule
     if use_quadgrams:
+        T0 = 10.0
+    else:
+        T0 = max(0.5, abs(score) * 10)
+
+    T = T0
+    decay = 0.9995
+    adaptive = schedule == 'adaptive'
+    worse = worse_accepted = 0
+    last_improvement = 0
+
+    for it in range(iters_per_restart):
+        if stop is not None and it % 1024 == 0 and stop.is_set():
+            break
+        if patience is not None and it - last_improvement >= patience:
+            break  # plateau
+
+        # random swap of two plaintext letters in the key
+        a, b = rng.sample(ALPHABET, 2)
+        ca, cb = key.inv[ord(a) - 65], key.inv[ord(b) - 65]
+
+        # apply swap
+        if dscorer is not None:
+            delta = dscorer.delta(key, ca, cb)
+            new_score = score + delta
+            key.swap(ca, cb)
+            new_plain = None  # only built when needed
+            accept = delta > 0 or rng.random() < math.exp(delta / max(T, 1e-12))
+        else:
+            key.swap(ca, cb)
+            new_plain = None  # only built on a cache miss or when needed
+            new_score = full_score(key)
+            delta = new_score - score
+            accept = delta > 0 or rng.random() < math.exp(delta / max(T, 1e-12))
+
+        if delta < 0:
+            worse += 1
+            worse_accepted += accept
+
+        if accept:
+            if dscorer is not None:
+                dscorer.commit()
+            plain = new_plain
+            score = new_score
+            if score > best_score:
+                best_score = score
+                best_mapping = key.copy()
+                best_plain = plain if plain is not None else apply_key_mapping(key, ctext)
+                last_improvement = it
+        else:
+            # revert swap
+            key.swap(ca, cb)
+
+        if not adaptive:
+            T *= decay
+        elif (it + 1) % ADAPT_BLOCK == 0:
+            target = ACCEPT_START * (ACCEPT_END / ACCEPT_START) ** min(1.0, it / ADAPT_ITERS)
+            rate = worse_accepted / worse if worse else target
+            # too many worsening moves accepted: cool down; too few: heat up
+            T *= 0.8 if rate > target else 1.25
+            worse = worse_accepted = 0
+
+    # small random shake at end of each restart
+    for _ in range(10):
+        x, y = rng.sample(ALPHABET, 2)
+        key.swap_plain(ord(x) - 65, ord(y) - 65)
+
+    return best_score, best_mapping, best_plain
+
+def make_delta_scorer(ctext, qscorer, delta_scoring):
+    # unigram scoring always uses the O(1) swap update; n-gram scoring only in delta mode
+    if qscorer is None:
+        return UnigramSwapScorer(ctext)
+    if delta_scoring:
+        return SwapDeltaScorer(qscorer, ctext)
+    return None
+
+# per-process state of the restart workers, filled in by _init_worker
+_worker = {}
+
+def _init_worker(ctext, qscorer, delta_scoring, stop, cribs, cache_size):
+    _worker['ctext'] = ctext
+    _worker['cribs'] = cribs
+    _worker['cache'] = ScoreCache(cache_size) if cache_size else None
+    _worker['qscorer'] = qscorer
+    _worker['dscorer'] = make_delta_scorer(ctext, qscorer, delta_scoring)
+    _worker['stop'] = stop
+
+def _restart_task(r, iters_per_restart, rseed, schedule, patience):
+    w = _worker
+    return (r,) + run_restart(w['ctext'], iters_per_restart, rseed, w['qscorer'], w['dscorer'], w['stop'],
+                              schedule, patience, w['cribs'], w['cache'])
+
+def iter_restarts(ctext, seeds, iters_per_restart, qscorer=None, delta_scoring=False, workers=1,
+                  schedule='fixed', patience=None, cribs=None, cache_size=None):
+    """Yield (restart, score, mapping, plain) for every restart, in completion order.
+
+    With workers > 1 the restarts run on a process pool. Closing the generator
+    early cancels the restarts that have not finished yet. cache_size > 0 gives
+    every process a ScoreCache of that many keys, shared by its restarts.
+    """
+    if workers <= 1:
+        dscorer = make_delta_scorer(ctext, qscorer, delta_scoring)
+        cache = ScoreCache(cache_size) if cache_size else None
+        for r, rseed in enumerate(seeds):
+            yield (r,) + run_restart(ctext, iters_per_restart, rseed, qscorer, dscorer, None, schedule, patience, cribs,
+                                     cache)
+        return
+
+    stop = multiprocessing.Event()
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                               initargs=(ctext, qscorer, delta_scoring, stop, cribs, cache_size))
+    try:
+        futures = [pool.submit(_restart_task, r, iters_per_restart, rseed, schedule, patience)
+                   for r, rseed in enumerate(seeds)]
+        for fut in as_completed(futures):
+            yield fut.result()
+    finally:
+        # tell running restarts to stop and drop the queued ones
+        stop.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def solve(ctext, restarts=50, iters_per_restart=5000, seed=None, use_quadgrams=True, delta_scoring=False, dense=True, qscorer=None,
+          workers=1, target_score=None, orders='auto', schedule='fixed', patience=None, stop_after_repeats=None,
+          pattern_index=None, cache_size=None):
+    # orders picks the dense n-gram model: 'auto' chooses by ciphertext length
+    # (see ngram_weights_for_length), or pass {order: weight}, e.g. {3: 0.5, 4: 0.5}
+    # schedule/patience are passed to run_restart; stop_after_repeats=K ends the
+    # search once K restarts have independently ended on the current best plaintext
+    # pattern_index is a word-pattern index file (word_patterns.py); when given,
+    # restarts start from keys seeded with dictionary words for repeated fragments
+    # cache_size > 0 memoizes full rescoring (delta_scoring=False) in a ScoreCache
+
+    # initialize n-gram scorer if available (unless the caller already loaded one)
+    if use_quadgrams and qscorer is None:
         try:
-            qscorer = QuadgramScorer('english_quadgrams.txt')
-            print("Quadgram scoring enabled")
+            if dense:
+                weights = ngram_weights_for_length(len(ctext)) if orders == 'auto' else orders
+                qscorer = load_ngram_scorer(weights)
+                print(f"N-gram scoring enabled (order: weight {weights})")
+            else:
+                qscorer = QuadgramScorer('english_quadgrams.txt')
+                print("Quadgram scoring enabled")
         except FileNotFoundError:
             print("Warning: english_quadgrams.txt not found, using unigram scoring only")
             use_quadgrams = False
+    if not use_quadgrams:
+        qscorer = None
+
+    cribs = None
+    if pattern_index is not None:
+        try:
+            cribs = fragment_cribs(ctext, load_pattern_index(pattern_index))
+            print(f"Seeding restarts from {len(cribs)} repeated fragments")
+        except FileNotFoundError:
+            print(f"Warning: {pattern_index} not found, starting from the frequency key")
 
     best_score = float('-inf')
     best_mapping = None
     best_plain = None
+    # plaintext -> number of restarts that ended on it; keys are not compared, since
+    # cipher letters absent from ctext can be permuted freely without changing the text
+    found = Counter()
 
-    for r in range(restarts):
-        print(f"Restart {r + 1}/{restarts}")
-        
-        # initial mapping and score using stats-based frequency mapping
-        mapping = initial_key_by_frequency_using_stats(ctext)
-        plain = apply_key_mapping(mapping, ctext)
-        
-        if use_quadgrams:
-            score = qscorer.score(plain)
-        else:
-            score = -D(plain, ESTATS)  
-
-        # simulated annealing schedule
-        if use_quadgrams:
-            T0 = 10.0
-        else:
-            T0 = max(0.5, abs(score) * 10)
-
-        T = T0
-        decay = 0.9995
-
-        for it in range(iters_per_restart):
-            # random swap of two letters in the key
-            a, b = random.sample(ALPHABET, 2)
-            ca = cb = None
-            for k, v in mapping.items():
-                if v == a:
-                    ca = k
-                elif v == b:
-                    cb = k
-                if ca and cb:
-                    break
-            if ca is None or cb is None:
-                continue
-
-            # apply swap
-            mapping[ca], mapping[cb] = mapping[cb], mapping[ca]
-            new_plain = apply_key_mapping(mapping, ctext)
-            
-            if use_quadgrams:
-                new_score = qscorer.score(new_plain)
-                delta = new_score - score
-                accept = delta > 0 or random.random() < math.exp(delta / max(T, 1e-12))
-            else:
-                new_score = -D(new_plain, ESTATS)
-                delta = new_score - score
-                accept = delta > 0 or random.random() < math.exp(delta / max(T, 1e-12))
-
-            if accept:
-                plain = new_plain
-                score = new_score
-                if score > best_score:
-                    best_score = score
-                    best_mapping = mapping.copy()
-                    best_plain = plain
-                    print(f"  New best score: {score:.4f}")
-            else:
-                # revert swap
-                mapping[ca], mapping[cb] = mapping[cb], mapping[ca]
+    # every restart gets its own seed, so results do not depend on the number of workers
+    seeds = restart_seeds(seed, restarts)
+    results = iter_restarts(ctext, seeds, iters_per_restart, qscorer, delta_scoring, workers, schedule, patience, cribs,
+                            cache_size)
+    for done, (r, score, mapping, plain) in enumerate(results, 1):
+        print(f"Restart {r + 1}/{restarts} done ({done}/{restarts}): score {score:.4f}")
+        if mapping is None:
+            continue
+        found[plain] += 1
+        if score > best_score:
+            best_score = score
+            best_mapping = mapping
+            best_plain = plain
+            print(f"  New best score: {score:.4f}")
 
-            T *= decay
+        if stop_after_repeats is not None and found[best_plain] >= stop_after_repeats:
+            print(f"Best plaintext found by {stop_after_repeats} restarts, cancelling remaining restarts")
+            results.close()
+            break
 
-        # small random shake at end of each restart
-        for _ in range(10):
-            x, y = random.sample(ALPHABET, 2)
-            ca = cb = None
-            for k, v in mapping.items():
-                if v == x:
-                    ca = k
-                elif v == y:
-                    cb = k
-                if ca and cb:
-                    break
-            if ca and cb:
-                mapping[ca], mapping[cb] = mapping[cb], mapping[ca]
+        if target_score is not None and best_score >= target_score:
+            print(f"Target score {target_score:.4f} reached, cancelling remaining restarts")
+            results.close()
+            break
 
     return best_mapping, best_plain, best_score
 
@@ -204,7 +837,9 @@ if __name__ == '__main__':
     C = ''.join([c for c in CIPHERTEXT if c in ALPHABET])
 
     print('Running solver...')
-    mapping, plain, score = solve(C, restarts=20, iters_per_restart=10000, seed=42, use_quadgrams=True)
+    mapping, plain, score = solve(C, restarts=20, iters_per_restart=10000, seed=42, use_quadgrams=True, delta_scoring=True,
+                                  workers=os.cpu_count(), schedule='adaptive', patience=2000, stop_after_repeats=3,
+                                  pattern_index='english_patterns.npy' if os.path.exists('english_patterns.npy') else None)
 
     if mapping is None:
         print('No solution found')
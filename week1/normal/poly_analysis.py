@@ -0,0 +1,111 @@
+import string
+
+import numpy as np
+
+import work17
+
+# Polyalphabetic analysis of the numeric ciphertexts in work17.py (letters coded
+# 1..26). The index of coincidence of every candidate period and the chi-squared
+# test of every column shift are computed with NumPy array operations instead
+# of nested Python loops.
+
+ALPHABET = string.ascii_uppercase
+
+# English letter frequencies from work17.Stats, in A..Z order
+EXPECTED = np.array([work17.Stats[c] for c in string.ascii_lowercase])
+IC_RANDOM = 1.0 / 26
+
+# --------------------------- Loading ---------------------------
+def load_message(msg):
+    """work17 list (1..26) -> int array of letter codes 0..25."""
+    return np.asarray(msg, dtype=np.intp) - 1
+
+def decode(codes):
+    return (np.asarray(codes, dtype=np.uint8) + 65).tobytes().decode('ascii')
+
+# --------------------------- Period finding ---------------------------
+def period_ic(codes, max_period=20, block=1 << 15):
+    """Mean column index of coincidence (sum of p^2, as I() in the notebook) for periods 1..max_period.
+
+    Every (period, column, letter) triple gets its own histogram bin, so all
+    periods are counted by one bincount per block of text; block bounds the
+    temporary arrays to max_period * block entries.
+    """
+    codes = np.asarray(codes, dtype=np.int32)
+    periods = np.arange(1, max_period + 1, dtype=np.int32)
+    first_col = np.concatenate(([0], np.cumsum(periods)[:-1]))  # first column id of each period
+    ncols = int(periods.sum())
+    base = (first_col * 26).astype(np.int32)
+
+    counts = np.zeros(ncols * 26, dtype=np.int64)
+    for start in range(0, len(codes), block):
+        chunk = codes[start:start + block]
+        pos = np.arange(start, start + len(chunk), dtype=np.int32)
+        # bin = (first column of the period + position % period) * 26 + letter, built in place
+        bins = pos[None, :] % periods[:, None]
+        bins *= 26
+        bins += base[:, None]
+        bins += chunk[None, :]
+        counts += np.bincount(bins.ravel(), minlength=ncols * 26)
+    counts = counts.reshape(ncols, 26)
+
+    sizes = counts.sum(axis=1)
+    col_ic = (counts ** 2).sum(axis=1) / np.maximum(sizes, 1) ** 2
+    # mean over the columns of each period
+    return np.add.reduceat(col_ic, first_col) / periods
+
+def guess_period(ics, ic_english=work17.Ic):
+    """Smallest period whose mean column IC is closer to English than to random text."""
+    threshold = (ic_english + IC_RANDOM) / 2
+    above = np.flatnonzero(ics >= threshold)
+    return int(above[0]) + 1 if len(above) else int(np.argmax(ics)) + 1
+
+# --------------------------- Column solving ---------------------------
+def column_counts(codes, period):
+    codes = np.asarray(codes, dtype=np.intp)
+    cols = np.arange(len(codes)) % period
+    return np.bincount(cols * 26 + codes, minlength=period * 26).reshape(period, 26)
+
+def solve_shifts(codes, period, expected=EXPECTED):
+    """Best Caesar shift of every column by a chi-squared test of all 26 shifts at once.
+
+    Returns (shifts, chi2) where chi2 has shape (period, 26).
+    """
+    counts = column_counts(codes, period)
+    sizes = counts.sum(axis=1)
+    # observed[col, k, x]: count of plaintext letter x in column col under shift k
+    shifted = (np.arange(26)[None, :] + np.arange(26)[:, None]) % 26
+    observed = counts[:, shifted]
+    exp = sizes[:, None, None] * expected[None, None, :]
+    chi2 = ((observed - exp) ** 2 / exp).sum(axis=2)
+    return np.argmin(chi2, axis=1), chi2
+
+def decrypt(codes, shifts):
+    codes = np.asarray(codes, dtype=np.intp)
+    shifts = np.asarray(shifts, dtype=np.intp)
+    return (codes - shifts[np.arange(len(codes)) % len(shifts)]) % 26
+
+def analyse(msg, max_period=20):
+    """Period, key, plaintext, per-period IC and per-column best chi-squared of a work17 list.
+
+    A large chi-squared means the column is not a plain shift of English (for
+    instance a mixed alphabet), so the key and plaintext should not be trusted.
+    """
+    codes = load_message(msg)
+    ics = period_ic(codes, max_period)
+    period = guess_period(ics)
+    shifts, chi2 = solve_shifts(codes, period)
+    key = ''.join(ALPHABET[k] for k in shifts)
+    return period, key, decode(decrypt(codes, shifts)), ics, chi2.min(axis=1)
+
+
+if __name__ == '__main__':
+    for name in ('msg1', 'msg2', 'msg3'):
+        period, key, plain, ics, fit = analyse(getattr(work17, name))
+        print(f"{name}: period {period}, key {key}, chi2 per column {np.round(fit, 1).tolist()}")
+        print('  IC by period: ' + ' '.join(f"{p}:{ic:.4f}" for p, ic in enumerate(ics, 1)))
+        if period == 1:
+            # a single alphabet is a monoalphabetic substitution, not a shift: see mono_cracker_improved.py
+            print('  period 1: monoalphabetic substitution, solve with mono_cracker_improved.solve')
+        else:
+            print('  ' + plain[:120])
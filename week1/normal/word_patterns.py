@@ -0,0 +1,132 @@
+import os
+import sys
+import string
+import argparse
+from collections import Counter
+
+import numpy as np
+
+# Word-pattern index for seeding substitution keys. A word's pattern names its
+# letters in order of first appearance (THAT -> ABCA, LETTER -> ABCCBD), so a
+# ciphertext fragment can only be the encryption of words with the same pattern.
+# The index is built once from a word list and saved as a sorted structured
+# .npy array, which is memory-mapped and searched with np.searchsorted.
+#
+#   python word_patterns.py words.txt -o english_patterns.npy
+
+ALPHABET = string.ascii_uppercase
+MAX_WORD_LEN = 16
+INDEX_DTYPE = np.dtype([('pattern', f'S{MAX_WORD_LEN}'), ('word', f'S{MAX_WORD_LEN}'), ('rank', np.int32)])
+
+# --------------------------- Index ---------------------------
+def word_pattern(word):
+    """Letter-repetition pattern of word: 'THAT' -> 'ABCA'."""
+    seen = {}
+    return ''.join(seen.setdefault(ch, ALPHABET[len(seen)]) for ch in word)
+
+def read_words(words_file):
+    """Words of a list in rank order.
+
+    Lines are either a word or 'word count' (as in english_quadgrams.txt); with
+    counts the words are ranked by count, otherwise by line order, so a
+    frequency-sorted list gives its common words rank 0, 1, 2...
+    """
+    counts = Counter()
+    order = {}
+    with open(words_file, 'r') as f:
+        for line in f:
+            parts = line.split()
+            if not parts:
+                continue
+            word = parts[0].upper()
+            if not (2 <= len(word) <= MAX_WORD_LEN) or any(c not in ALPHABET for c in word):
+                continue
+            order.setdefault(word, len(order))
+            counts[word] += int(parts[1]) if len(parts) > 1 else 0
+    return sorted(order, key=lambda w: (-counts[w], order[w]))
+
+def build_pattern_index(words_file, index_file):
+    """Build the pattern index of a word list and save it to index_file."""
+    words = read_words(words_file)
+    index = np.empty(len(words), dtype=INDEX_DTYPE)
+    index['pattern'] = [word_pattern(w) for w in words]
+    index['word'] = words
+    index['rank'] = np.arange(len(words))
+    # by pattern, then rank, so the candidates of a pattern are contiguous and best first
+    index.sort(order=['pattern', 'rank'])
+
+    tmp_file = index_file + f'.{os.getpid()}.tmp'
+    with open(tmp_file, 'wb') as f:
+        np.save(f, index)
+    os.replace(tmp_file, index_file)
+    return index
+
+def load_pattern_index(index_file):
+    return np.load(index_file, mmap_mode='r')
+
+def pattern_candidates(index, pattern, limit=None):
+    """Words of the index with this pattern, most common first."""
+    key = pattern.encode('ascii')
+    patterns = index['pattern']
+    lo = np.searchsorted(patterns, key, side='left')
+    hi = np.searchsorted(patterns, key, side='right')
+    if limit is not None:
+        hi = min(hi, lo + limit)
+    return [w.decode('ascii') for w in index['word'][lo:hi]]
+
+# --------------------------- Cribs ---------------------------
+def repeated_fragments(ctext, min_len=3, max_len=12):
+    """Ciphertext substrings seen at least twice, as (fragment, occurrences)."""
+    found = []
+    for n in range(min_len, min(max_len, len(ctext)) + 1):
+        counts = Counter(ctext[i:i + n] for i in range(len(ctext) - n + 1))
+        found.extend((frag, k) for frag, k in counts.items() if k > 1)
+    return found
+
+def fragment_cribs(ctext, index, max_fragments=40, candidates_per_fragment=20):
+    """Repeated fragments of ctext that match dictionary words, with their candidates.
+
+    Returns [(fragment, weight, words)], where weight favours long, frequent
+    fragments. The list is small and plain Python, so it is cheap to send to
+    worker processes.
+    """
+    cribs = []
+    for frag, k in repeated_fragments(ctext):
+        words = pattern_candidates(index, word_pattern(frag), candidates_per_fragment)
+        if words:
+            cribs.append((frag, len(frag) * k, words))
+    cribs.sort(key=lambda c: -c[1])
+    return cribs[:max_fragments]
+
+def sample_partial_key(cribs, rng, max_words=4, spread=2.0):
+    """Random consistent partial key (cipher letter -> plain letter) from a few cribs.
+
+    Fragments are drawn by weight and words by rank (index ~ Exp(1/spread)), so
+    common words are tried most but every restart gets a different combination.
+    Words that would map a letter two ways are skipped.
+    """
+    if not cribs:
+        return {}
+    fwd, inv = {}, {}
+    weights = [c[1] for c in cribs]
+    for _ in range(max_words):
+        frag, _, words = rng.choices(cribs, weights)[0]
+        word = words[min(int(rng.expovariate(1 / spread)), len(words) - 1)]
+        if all(fwd.get(c, p) == p and inv.get(p, c) == c for c, p in zip(frag, word)):
+            for c, p in zip(frag, word):
+                fwd[c], inv[p] = p, c
+    return fwd
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the word-pattern index used to seed substitution keys.')
+    parser.add_argument('words', help="word list: one word (optionally followed by a count) per line")
+    parser.add_argument('-o', '--output', default='english_patterns.npy')
+    args = parser.parse_args(argv)
+
+    index = build_pattern_index(args.words, args.output)
+    patterns = len(np.unique(index['pattern']))
+    print(f"Indexed {len(index)} words under {patterns} patterns into {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
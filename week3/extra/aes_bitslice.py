@@ -0,0 +1,221 @@
+# Bitsliced AES-128 over NumPy uint64 lanes
+#
+# Many keys are processed at once: an AES state is held as 128 bit planes, one
+# per (byte, bit) of the block, and bit j of word w of a plane belongs to key
+# 64*w + j. Every AES step is then a handful of AND/XOR operations on whole
+# planes, so one call encrypts or decrypts a block under 64*W keys and the cost
+# per key shrinks with W instead of paying the interpreter for every key.
+#
+# Layout: planes have shape (16, 8, W) -> (byte of the block in AES order,
+# bit of the byte with bit 0 the least significant, word of 64 keys).
+import numpy as np
+
+LANES = 64
+ONES = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+# --------------------------- Bit slicing ---------------------------
+def bitslice(blocks):
+	"""(N, 16) uint8 blocks -> (16, 8, W) uint64 planes, N padded with zero blocks to 64*W."""
+	blocks = np.asarray(blocks, dtype=np.uint8)
+	n = len(blocks)
+	words = -(-n // LANES)
+	if n != words * LANES:
+		blocks = np.concatenate([blocks, np.zeros((words * LANES - n, blocks.shape[1]), dtype=np.uint8)])
+	# bits[byte, bit, key]
+	bits = (blocks.T[:, None, :] >> np.arange(8, dtype=np.uint8)[None, :, None]) & 1
+	packed = np.packbits(bits, axis=2, bitorder='little')
+	return np.ascontiguousarray(packed).view('<u8')
+
+def unbitslice(planes, n=None):
+	"""(16, 8, W) uint64 planes -> (N, 16) uint8 blocks (the first n of them)."""
+	bits = np.unpackbits(np.ascontiguousarray(planes).view(np.uint8), axis=2, bitorder='little')
+	blocks = (bits << np.arange(8, dtype=np.uint8)[None, :, None]).sum(axis=1, dtype=np.uint8).T
+	return blocks if n is None else blocks[:n]
+
+def constant_planes(block, words=1):
+	"""Planes of the same 16-byte block under every key: all-ones where the bit is set."""
+	bits = (np.frombuffer(bytes(block), dtype=np.uint8)[:, None] >> np.arange(8, dtype=np.uint8)) & 1
+	return np.broadcast_to((bits.astype(np.uint64) * ONES)[:, :, None], (16, 8, words)).copy()
+
+# --------------------------- GF(2^8) ---------------------------
+# elements are (..., 8, W) stacks of bit planes; the field polynomial is
+# x^8 + x^4 + x^3 + x + 1, so x^8 folds back onto x^4, x^3, x and 1
+def gf_reduce(t):
+	"""(..., 15, W) polynomial of degree <= 14 -> (..., 8, W) element."""
+	# fold degrees 8..14, then the degrees 8..10 that the first fold produced
+	for hi in (15, 11):
+		h = t[..., 8:hi, :].copy()
+		t[..., 8:hi, :] = 0
+		for shift in (0, 1, 3, 4):
+			t[..., shift:shift + hi - 8, :] ^= h
+	return t[..., :8, :]
+
+def gf_mul(a, b):
+	t = np.zeros(a.shape[:-2] + (15, a.shape[-1]), dtype=np.uint64)
+	for i in range(8):
+		t[..., i:i + 8, :] ^= a[..., i:i + 1, :] & b
+	return gf_reduce(t)
+
+def gf_square(a):
+	# squaring is linear in characteristic 2: a_i x^i -> a_i x^2i
+	t = np.zeros(a.shape[:-2] + (15, a.shape[-1]), dtype=np.uint64)
+	t[..., 0::2, :] = a
+	return gf_reduce(t)
+
+def gf_inv(a):
+	"""a^254, the multiplicative inverse (0 stays 0), by square-and-multiply."""
+	a2 = gf_square(a)
+	a3 = gf_mul(a2, a)
+	a7 = gf_mul(gf_square(a3), a)
+	a15 = gf_mul(gf_square(a7), a)
+	a31 = gf_mul(gf_square(a15), a)
+	a63 = gf_mul(gf_square(a31), a)
+	a127 = gf_mul(gf_square(a63), a)
+	return gf_square(a127)
+
+def xor_constant(a, c):
+	# XOR every byte with the constant c: invert the planes of its set bits
+	out = a.copy()
+	for k in range(8):
+		if c >> k & 1:
+			out[..., k, :] ^= ONES
+	return out
+
+def xtime(a):
+	"""Multiplication by x (0x02)."""
+	out = np.empty_like(a)
+	out[..., 0, :] = 0
+	out[..., 1:, :] = a[..., :7, :]
+	for k in (0, 1, 3, 4):
+		out[..., k, :] ^= a[..., 7, :]
+	return out
+
+# --------------------------- S-box ---------------------------
+def affine(a):
+	# b_i ^ b_(i+4) ^ b_(i+5) ^ b_(i+6) ^ b_(i+7), indices mod 8, then ^ 0x63
+	out = a.copy()
+	for r in (4, 5, 6, 7):
+		out ^= np.roll(a, -r, axis=-2)
+	return xor_constant(out, 0x63)
+
+def inv_affine(a):
+	# b_(i+2) ^ b_(i+5) ^ b_(i+7), indices mod 8, then ^ 0x05
+	out = np.roll(a, -2, axis=-2) ^ np.roll(a, -5, axis=-2) ^ np.roll(a, -7, axis=-2)
+	return xor_constant(out, 0x05)
+
+def sub_bytes(a):
+	return affine(gf_inv(a))
+
+def inv_sub_bytes(a):
+	return gf_inv(inv_affine(a))
+
+# --------------------------- Rounds ---------------------------
+# byte r + 4c of the state is row r of column c
+SHIFT_ROWS = np.array([r + 4 * ((c + r) % 4) for c in range(4) for r in range(4)])
+INV_SHIFT_ROWS = np.argsort(SHIFT_ROWS)
+
+def shift_rows(s):
+	return s[SHIFT_ROWS]
+
+def inv_shift_rows(s):
+	return s[INV_SHIFT_ROWS]
+
+def mix_columns(s):
+	a = s.reshape(4, 4, 8, -1)              # column, row, bit, word
+	b = xtime(a)
+	a1 = np.roll(a, -1, axis=1)             # row r + 1 of the same column
+	b1 = np.roll(b, -1, axis=1)
+	# 2*a_r ^ 3*a_(r+1) ^ a_(r+2) ^ a_(r+3)
+	out = b ^ b1 ^ a1 ^ np.roll(a, -2, axis=1) ^ np.roll(a, -3, axis=1)
+	return out.reshape(s.shape)
+
+def inv_mix_columns(s):
+	a = s.reshape(4, 4, 8, -1)
+	x2 = xtime(a)
+	x4 = xtime(x2)
+	x8 = xtime(x4)
+	e = x8 ^ x4 ^ x2                        # 14
+	bb = x8 ^ x2 ^ a                        # 11
+	d = x8 ^ x4 ^ a                         # 13
+	n = x8 ^ a                              # 9
+	# 14*a_r ^ 11*a_(r+1) ^ 13*a_(r+2) ^ 9*a_(r+3)
+	out = e ^ np.roll(bb, -1, axis=1) ^ np.roll(d, -2, axis=1) ^ np.roll(n, -3, axis=1)
+	return out.reshape(s.shape)
+
+RCON = (0x01, 0x02, 0x04, 0x08, 0x10, 0x20, 0x40, 0x80, 0x1B, 0x36)
+
+def expand_key(key_planes):
+	"""(16, 8, W) planes of AES-128 keys -> (11, 16, 8, W) round keys."""
+	w = list(key_planes.reshape(4, 4, 8, -1))   # words of 4 bytes
+	for i in range(4, 44):
+		t = w[i - 1]
+		if i % 4 == 0:
+			t = sub_bytes(np.roll(t, -1, axis=0))  # RotWord, SubWord (a new array)
+			t[0] = xor_constant(t[0], RCON[i // 4 - 1])
+		w.append(w[i - 4] ^ t)
+	return np.stack(w).reshape(11, 16, 8, -1)
+
+def encrypt(state, round_keys):
+	"""Encrypt (16, 8, W) state planes under (11, 16, 8, W) round keys."""
+	s = state ^ round_keys[0]
+	for rnd in range(1, 10):
+		s = mix_columns(shift_rows(sub_bytes(s))) ^ round_keys[rnd]
+	return shift_rows(sub_bytes(s)) ^ round_keys[10]
+
+def decrypt(state, round_keys):
+	s = inv_sub_bytes(inv_shift_rows(state ^ round_keys[10]))
+	for rnd in range(9, 0, -1):
+		s = inv_sub_bytes(inv_shift_rows(inv_mix_columns(s ^ round_keys[rnd])))
+	return s ^ round_keys[0]
+
+# --------------------------- Blocks ---------------------------
+def encrypt_block(keys, block):
+	"""Encrypt one 16-byte block under each of the (N, 16) keys; returns (N, 16) uint8."""
+	round_keys = expand_key(bitslice(keys))
+	return unbitslice(encrypt(constant_planes(block, round_keys.shape[-1]), round_keys), len(keys))
+
+def decrypt_block(keys, block):
+	"""Decrypt one 16-byte block under each of the (N, 16) keys; returns (N, 16) uint8."""
+	round_keys = expand_key(bitslice(keys))
+	return unbitslice(decrypt(constant_planes(block, round_keys.shape[-1]), round_keys), len(keys))
+
+# bit p < 6 of key 64*w + j is bit p of the lane index j: a fixed pattern per plane
+LANE_PATTERNS = [sum(1 << j for j in range(LANES) if j >> p & 1) for p in range(6)]
+
+def int_key_planes(lo, words, keylen=16):
+	"""(keylen, 8, words) planes of the big-endian keys lo..lo + 64*words - 1, without slicing.
+
+	lo must be a multiple of 64, so bits 0..5 follow LANE_PATTERNS and every
+	higher bit is the same for the 64 keys of a word.
+	"""
+	assert lo % LANES == 0
+	planes = np.zeros((keylen, 8, words), dtype=np.uint64)
+	bases = np.arange(lo, lo + LANES * words, LANES, dtype=np.uint64)
+	for p in range(min(64, 8 * keylen)):
+		b, k = keylen - 1 - p // 8, p % 8
+		if p < 6:
+			planes[b, k] = LANE_PATTERNS[p]
+		else:
+			planes[b, k] = ((bases >> np.uint64(p)) & np.uint64(1)) * ONES
+	return planes
+
+def match_planes(key_planes, pt_block, ct_block):
+	"""Lane indices whose key (given as planes) encrypts pt_block to ct_block.
+
+	Compares in the sliced domain: a lane survives only if all 128 planes of
+	its encryption equal the ciphertext bits, so nothing is unsliced.
+	"""
+	round_keys = expand_key(key_planes)
+	words = round_keys.shape[-1]
+	diff = encrypt(constant_planes(pt_block, words), round_keys) ^ constant_planes(ct_block, words)
+	miss = np.bitwise_or.reduce(diff.reshape(128, words), axis=0)
+	return np.flatnonzero(np.unpackbits((~miss).view(np.uint8), bitorder='little'))
+
+def match_int_keys(lo, words, pt_block, ct_block):
+	"""Offsets i < 64*words such that key lo + i encrypts pt_block to ct_block (lo a multiple of 64)."""
+	return match_planes(int_key_planes(lo, words), pt_block, ct_block)
+
+def match_lanes(keys, pt_block, ct_block):
+	"""Indices of the (N, 16) keys that encrypt pt_block to ct_block."""
+	hits = match_planes(bitslice(keys), pt_block, ct_block)
+	return hits[hits < len(keys)]
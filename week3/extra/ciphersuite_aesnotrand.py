@@ -17,15 +17,9 @@ def gen():
 def enc(k, m):
 	cipher = Cipher(algorithms.AES(k), modes.ECB())
 	encryptor = cipher.encryptor()
-	cph = b""
-	cph += encryptor.update(m)
-	cph += encryptor.finalize()
-	return cph
+	return encryptor.update(m) + encryptor.finalize()
 
 def dec(k, c):
 	cipher = Cipher(algorithms.AES(k), modes.ECB())
 	decryptor = cipher.decryptor()
-	msg = b""
-	msg += decryptor.update(c)
-	msg += decryptor.finalize()
-	return msg
+	return decryptor.update(c) + decryptor.finalize()
@@ -0,0 +1,156 @@
+# Streaming, multi-core AES-CTR file encryption
+#
+# CTR turns AES into a keystream whose block i depends only on the counter
+# nonce + i, so any byte range of a file can be encrypted on its own. The file
+# is cut into ranges that a process pool encrypts in parallel; every worker
+# reads with os.preadv into a buffer allocated once, encrypts with update_into
+# and writes with os.pwrite straight to the final offset of the output file.
+# Memory stays at two buffers per worker whatever the file size.
+#
+# Output layout: the 16-byte initial counter block (nonce), then the ciphertext.
+#
+#   python filecrypt.py enc file.txt file.enc --key 000102...0f
+#   python filecrypt.py dec file.enc file.out --key 000102...0f
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+import ciphersuite_aesnotrand as ciphersuite
+
+BLOCK = 16
+NONCE_LEN = 16
+RANGE_SIZE = 64 << 20   # bytes per task (a counter range of RANGE_SIZE / 16 blocks)
+BUFFER_SIZE = 1 << 20   # bytes read, encrypted and written at a time
+
+def counter_block(nonce, offset):
+	"""Counter block of the keystream at byte offset (a multiple of 16)."""
+	ctr = (int.from_bytes(nonce, 'big') + offset // BLOCK) % (1 << 128)
+	return ctr.to_bytes(BLOCK, 'big')
+
+# --------------------------- Workers ---------------------------
+# per-process state, filled in once by _init_worker
+_worker = {}
+
+def _init_worker(src, dst, key, nonce, src_base, dst_base, buffer_size):
+	_worker['src'] = os.open(src, os.O_RDONLY)
+	_worker['dst'] = os.open(dst, os.O_WRONLY)
+	_worker['key'] = key
+	_worker['nonce'] = nonce
+	_worker['src_base'] = src_base
+	_worker['dst_base'] = dst_base
+	_worker['inbuf'] = bytearray(buffer_size)
+	_worker['outbuf'] = bytearray(buffer_size + BLOCK - 1)  # update_into slack
+
+def _crypt_range(offset, length):
+	"""XOR the keystream into bytes [offset, offset + length) of the payload."""
+	w = _worker
+	inbuf, outbuf = memoryview(w['inbuf']), memoryview(w['outbuf'])
+	ctx = Cipher(algorithms.AES(w['key']), modes.CTR(counter_block(w['nonce'], offset))).encryptor()
+	done = 0
+	while done < length:
+		n = os.preadv(w['src'], [inbuf[:min(len(inbuf), length - done)]], w['src_base'] + offset + done)
+		if n == 0:
+			raise EOFError('input ended at offset {}'.format(offset + done))
+		ctx.update_into(inbuf[:n], outbuf)
+		view = outbuf[:n]
+		while view:
+			written = os.pwrite(w['dst'], view, w['dst_base'] + offset + done)
+			view = view[written:]
+			done += written
+	return length
+
+# --------------------------- Driver ---------------------------
+def crypt_file(src, dst, key, nonce, src_base, dst_base, length, workers=None, range_size=RANGE_SIZE,
+	buffer_size=BUFFER_SIZE):
+	"""Apply the CTR keystream to length payload bytes of src (from src_base) into dst (from dst_base)."""
+	workers = workers or os.cpu_count()
+	# ranges start on block boundaries so each maps to a whole counter range
+	range_size = max(BLOCK, range_size - range_size % BLOCK)
+	buffer_size = min(buffer_size, range_size)
+	ranges = [(off, min(range_size, length - off)) for off in range(0, length, range_size)]
+	if len(ranges) == 1 or workers <= 1:
+		_init_worker(src, dst, key, nonce, src_base, dst_base, buffer_size)
+		try:
+			for off, n in ranges:
+				_crypt_range(off, n)
+		finally:
+			os.close(_worker['src'])
+			os.close(_worker['dst'])
+		return
+
+	with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+		initargs=(src, dst, key, nonce, src_base, dst_base, buffer_size)) as pool:
+		pending = set()
+		for off, n in ranges:
+			pending.add(pool.submit(_crypt_range, off, n))
+			if len(pending) >= 2 * workers:
+				finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+				for fut in finished:
+					fut.result()
+		for fut in pending:
+			fut.result()
+
+def check_distinct(src, dst):
+	# dst is truncated before src is read, so the same file (or a link to it)
+	# would be destroyed instead of converted
+	if os.path.exists(dst) and os.path.samefile(src, dst):
+		raise ValueError('{} and {} are the same file'.format(src, dst))
+
+def encrypt_file(src, dst, key, nonce=None, workers=None, range_size=RANGE_SIZE):
+	"""Encrypt src into dst as nonce || AES-CTR(src); returns the nonce."""
+	check_distinct(src, dst)
+	nonce = nonce or os.urandom(NONCE_LEN)
+	length = os.path.getsize(src)
+	# write the header and size the output once, so workers only pwrite into it
+	with open(dst, 'wb') as f:
+		f.write(nonce)
+		f.truncate(NONCE_LEN + length)
+	crypt_file(src, dst, key, nonce, 0, NONCE_LEN, length, workers, range_size)
+	return nonce
+
+def decrypt_file(src, dst, key, workers=None, range_size=RANGE_SIZE):
+	"""Decrypt a file written by encrypt_file."""
+	check_distinct(src, dst)
+	with open(src, 'rb') as f:
+		nonce = f.read(NONCE_LEN)
+	if len(nonce) != NONCE_LEN:
+		raise ValueError('{} is too short to hold the nonce'.format(src))
+	length = os.path.getsize(src) - NONCE_LEN
+	with open(dst, 'wb') as f:
+		f.truncate(length)
+	crypt_file(src, dst, key, nonce, NONCE_LEN, 0, length, workers, range_size)
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Encrypt or decrypt a file with AES-CTR on all cores.')
+	parser.add_argument('action', choices=('enc', 'dec'))
+	parser.add_argument('input')
+	parser.add_argument('output')
+	parser.add_argument('--key', help='hex key; enc generates a random one when omitted')
+	parser.add_argument('--workers', type=int, default=os.cpu_count())
+	parser.add_argument('--range-mb', type=int, default=RANGE_SIZE >> 20, help='MiB per parallel counter range')
+	args = parser.parse_args(argv)
+
+	if args.key is None:
+		if args.action == 'dec':
+			parser.error('dec needs --key')
+		key = os.urandom(ciphersuite.KEYLEN)
+		print('Key: {}'.format(key.hex()), file=sys.stderr)
+	else:
+		key = bytes.fromhex(args.key)
+
+	start = time.perf_counter()
+	if args.action == 'enc':
+		encrypt_file(args.input, args.output, key, workers=args.workers, range_size=args.range_mb << 20)
+	else:
+		decrypt_file(args.input, args.output, key, workers=args.workers, range_size=args.range_mb << 20)
+	elapsed = time.perf_counter() - start
+	size = os.path.getsize(args.input)
+	print('{} bytes in {:.2f}s ({:.1f} MB/s)'.format(size, elapsed, size / elapsed / 1e6 if elapsed else 0), file=sys.stderr)
+
+
+if __name__ == '__main__':
+	main()
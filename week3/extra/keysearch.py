@@ -0,0 +1,452 @@
+# Parallel, resumable brute force over the integer key space of ciphersuite_aesnotrand
+#
+# The key space [start, stop) is cut into chunks that a process pool tries in
+# order. Progress (keys/s and ETA) is printed to stderr, the lowest key not yet
+# fully searched is checkpointed to a JSON file so an interrupted run resumes
+# where it stopped, and the first hit stops every worker.
+import os
+import sys
+import json
+import time
+import heapq
+import signal
+import hashlib
+import threading
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+import ciphersuite_aesnotrand as ciphersuite
+import aes_bitslice
+
+CHUNK = 1 << 16           # keys per task
+STOP_CHECK = 1 << 12      # keys between checks of the stop event
+PROGRESS_EVERY = 5.0      # seconds between progress lines
+CHECKPOINT_EVERY = 30.0   # seconds between checkpoint writes
+BLOCK = 16                # AES block size
+BITSLICE_WORDS = 1024     # 64-key words per bitsliced AES call
+
+def int_to_key(val):
+	# val in big endian, left padded with zero bytes (the layout of ciphersuite.gen keys)
+	return val.to_bytes(ciphersuite.KEYLEN, 'big')
+
+# --------------------------- Key enumeration ---------------------------
+def subspaces(max_offset=4, start=1):
+	"""Key-integer ranges (offset, lo, hi) of keys whose random part is exactly offset bytes.
+
+	ciphersuite.gen() draws offset uniformly from 1..3, so the 2^8 keys of
+	offset 1 hold a third of all keys, the 2^16 of offset 2 another third, and
+	so on: searching the sub-spaces from small to large is the order of
+	likelihood. Offset 4 is the 2^32 bound of q1.py.
+	"""
+	spaces = []
+	for offset in range(1, max_offset + 1):
+		lo = max(start, 1 << 8 * (offset - 1) if offset > 1 else 0)
+		hi = 1 << 8 * offset
+		if lo < hi:
+			spaces.append((offset, lo, hi))
+	return spaces
+
+def iter_keys(lo, hi):
+	"""Yield every key lo..hi-1 in turn in one reused KEYLEN bytearray.
+
+	Only the last byte is written per key; the bytes before it change on a
+	carry, once every 256 keys. Copy the buffer (bytes(key)) to keep a key.
+	"""
+	buf = bytearray(int_to_key(lo))
+	i = lo
+	while i < hi:
+		# run the last byte to the end of its 256-key block (or to hi)
+		end = min(hi, (i | 0xff) + 1)
+		for b in range(i & 0xff, ((end - 1) & 0xff) + 1):
+			buf[-1] = b
+			yield buf
+		i = end
+		# carry into the preceding bytes
+		j = len(buf) - 2
+		while j >= 0:
+			buf[j] = (buf[j] + 1) & 0xff
+			if buf[j]:
+				break
+			j -= 1
+
+# --------------------------- Key trials ---------------------------
+def make_block_trial(ct_block, pt_block):
+	"""trial(key) -> True if key decrypts the 16-byte ECB block ct_block to pt_block.
+
+	Only one block is decrypted per key, into a buffer allocated once, with the
+	ECB mode object reused and no finalize; most of what remains is OpenSSL's
+	context and key-schedule setup in decryptor().
+	"""
+	ct_block, pt_block = bytes(ct_block), bytes(pt_block)
+	buf = bytearray(2 * BLOCK)  # update_into needs len(data) + BLOCK - 1 bytes
+	out = memoryview(buf)[:BLOCK]
+	ecb = modes.ECB()
+	AES = algorithms.AES
+
+	def trial(key):
+		Cipher(AES(key), ecb).decryptor().update_into(ct_block, buf)
+		return out == pt_block
+	return trial
+
+def make_full_trial(ciphertext, plaintext):
+	# the original q1 test: decrypt everything with ciphersuite.dec and compare
+	ciphertext, plaintext = bytes(ciphertext), bytes(plaintext)
+	return lambda key: ciphersuite.dec(key, ciphertext) == plaintext
+
+def make_trial(ciphertext, plaintext, mode='block'):
+	"""Key test for a known plaintext; 'block' checks the first block, then confirms in full."""
+	full = make_full_trial(ciphertext, plaintext)
+	if mode == 'full' or len(ciphertext) < BLOCK or len(plaintext) < BLOCK:
+		return full
+	block = make_block_trial(ciphertext[:BLOCK], plaintext[:BLOCK])
+	return lambda key: block(key) and full(key)
+
+# --------------------------- Checkpoints ---------------------------
+def target_id(ciphertext, plaintext):
+	# identifies the search, so a checkpoint is never applied to another ciphertext
+	return hashlib.sha256(bytes(ciphertext) + b'|' + bytes(plaintext)).hexdigest()
+
+def load_checkpoint(path, target, start, stop):
+	"""Key to resume from: the checkpointed position if it belongs to this search, else start."""
+	if path is None or not os.path.exists(path):
+		return start
+	with open(path, 'r') as f:
+		state = json.load(f)
+	if state.get('target') != target or state.get('start') != start or state.get('stop') != stop:
+		return start
+	return max(start, min(stop, state['next']))
+
+def save_checkpoint(path, target, start, stop, nxt):
+	tmp = path + '.{}.tmp'.format(os.getpid())
+	with open(tmp, 'w') as f:
+		json.dump({'target': target, 'start': start, 'stop': stop, 'next': nxt}, f)
+	os.replace(tmp, path)
+
+def clipped_subspaces(start, stop):
+	"""The non-empty sub-spaces (offset, lo, hi) of [start, stop)."""
+	max_offset = max(1, ((stop - 1).bit_length() + 7) // 8)
+	return [(offset, lo, min(hi, stop)) for offset, lo, hi in subspaces(max_offset, start) if lo < min(hi, stop)]
+
+def plan_chunks(start, stop, chunk_size, workers):
+	"""Chunks (offset, lo, hi) of [start, stop), sub-space by sub-space.
+
+	Chunks never straddle two sub-spaces and a sub-space is cut into at least
+	workers chunks, so even the 2^8 and 2^16 ones run on every core at once.
+	"""
+	for offset, lo, hi in clipped_subspaces(start, stop):
+		size = max(256, min(chunk_size, -(-(hi - lo) // workers)))
+		for c in range(lo, hi, size):
+			yield offset, c, min(c + size, hi)
+
+# --------------------------- Workers ---------------------------
+# per-process state, filled in once by _init_worker
+_worker = {}
+
+def _init_worker(ciphertext, plaintext, mode, backend, stop):
+	# Ctrl-C reaches the whole process group; only the driver handles it and
+	# stops the workers through the event
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+	_worker['trial'] = make_trial(ciphertext, plaintext, mode)
+	_worker['confirm'] = make_full_trial(ciphertext, plaintext)
+	_worker['blocks'] = bytes(plaintext[:BLOCK]), bytes(ciphertext[:BLOCK])
+	_worker['backend'] = backend
+	_worker['stop'] = stop
+
+def _search_chunk(lo, hi):
+	"""Try keys lo..hi-1; returns (lo, hi, key or None)."""
+	if _worker['backend'] == 'bitslice':
+		return _search_chunk_bitslice(lo, hi)
+	trial, stop = _worker['trial'], _worker['stop']
+	for n, key in enumerate(iter_keys(lo, hi)):
+		if n % STOP_CHECK == 0 and stop.is_set():
+			break
+		if trial(key):
+			return lo, hi, bytes(key)
+	return lo, hi, None
+
+def _search_chunk_bitslice(lo, hi):
+	# 64 * BITSLICE_WORDS keys per bitsliced encryption of the known block,
+	# from a 64-aligned base; keys outside [lo, hi) are ignored
+	confirm, stop = _worker['confirm'], _worker['stop']
+	pt_block, ct_block = _worker['blocks']
+	lanes = aes_bitslice.LANES
+	base = lo - lo % lanes
+	while base < hi:
+		if stop.is_set():
+			break
+		words = min(BITSLICE_WORDS, -(-(hi - base) // lanes))
+		for i in aes_bitslice.match_int_keys(base, words, pt_block, ct_block):
+			val = base + int(i)
+			if lo <= val < hi and confirm(int_to_key(val)):
+				return lo, hi, int_to_key(val)
+		base += lanes * words
+	return lo, hi, None
+
+# --------------------------- Driver ---------------------------
+@contextlib.contextmanager
+def sigint_deferred():
+	# a second Ctrl-C while the pool shuts down would abort the shutdown and
+	# leave the workers behind, so SIGINT is ignored until it is done
+	if threading.current_thread() is not threading.main_thread():
+		yield
+		return
+	previous = signal.signal(signal.SIGINT, signal.SIG_IGN)
+	try:
+		yield
+	finally:
+		signal.signal(signal.SIGINT, previous)
+
+def format_eta(seconds):
+	seconds = int(seconds)
+	return '{}h{:02d}m{:02d}s'.format(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+def run_chunks(task, chunks, total, workers, initializer, initargs, on_result, log, progress=None, note=None):
+	"""Run task(lo, hi) on a process pool for every (offset, lo, hi) of chunks; returns (keys tried, seconds).
+
+	Each worker runs initializer(*initargs, stop_event) first and task returns
+	(lo, hi, ...). Chunks are submitted in order, every worker busy plus a small
+	queue, and on_result gets each result in the driver as it finishes; it
+	returns True to end the run early. Every PROGRESS_EVERY seconds the share
+	of total done (progress(), by default the keys tried), keys/s, ETA and
+	note() go to log. However the run ends (last chunk, early stop, error or
+	Ctrl-C) running chunks are stopped through the event and queued ones dropped.
+	"""
+	stop_event = multiprocessing.Event()
+	pool = ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=tuple(initargs) + (stop_event,))
+	t0 = last_progress = time.perf_counter()
+	tested = 0
+	chunks = iter(chunks)
+	exhausted = False
+	pending = set()
+	try:
+		while not exhausted or pending:
+			# keep every worker busy plus a small queue
+			while not exhausted and len(pending) < 2 * workers:
+				try:
+					_, lo, hi = next(chunks)
+				except StopIteration:
+					exhausted = True
+					break
+				pending.add(pool.submit(task, lo, hi))
+			if not pending:
+				break
+
+			finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+			stop = False
+			for fut in finished:
+				result = fut.result()
+				tested += result[1] - result[0]
+				stop = on_result(result) or stop
+			if stop:
+				break
+
+			now = time.perf_counter()
+			if now - last_progress >= PROGRESS_EVERY:
+				rate = tested / (now - t0)
+				done = progress() if progress else tested
+				eta = (total - done) / rate if rate else float('inf')
+				print('{:.1f}% keys/s={:,.0f} ETA {}{}'.format(100.0 * done / total, rate, format_eta(eta),
+					note() if note else ''), file=log)
+				last_progress = now
+	finally:
+		# tell running chunks to stop and drop the queued ones
+		with sigint_deferred():
+			stop_event.set()
+			pool.shutdown(wait=True, cancel_futures=True)
+	return tested, time.perf_counter() - t0
+
+def search(ciphertext, plaintext, start=1, stop=2**32 + 1, workers=None, chunk_size=CHUNK, checkpoint=None, log=sys.stderr,
+	mode='block', backend='openssl'):
+	"""Find the key in [start, stop) that decrypts ciphertext to plaintext; returns it or None.
+
+	mode='block' tests each key on the first 16-byte block only and decrypts the
+	whole ciphertext just for keys that pass; mode='full' decrypts everything.
+	backend='bitslice' tests 64 * BITSLICE_WORDS keys per call with the NumPy
+	bitsliced AES in aes_bitslice.py instead of one OpenSSL context per key; it
+	needs a full first block and raises ValueError on a shorter plaintext or
+	ciphertext.
+
+	Keys are tried sub-space by sub-space (see plan_chunks), most likely first.
+	With checkpoint set to a file name the search resumes from, and periodically
+	saves, the first key whose chunk (and every chunk before it) is done.
+	"""
+	if backend == 'bitslice' and (len(ciphertext) < BLOCK or len(plaintext) < BLOCK):
+		# checked here: in a worker the error would only surface from the pool
+		raise ValueError('the bitslice backend needs at least {} bytes of known plaintext and ciphertext'.format(BLOCK))
+	workers = workers or os.cpu_count()
+	target = target_id(ciphertext, plaintext)
+	first = load_checkpoint(checkpoint, target, start, stop)
+	if first > start:
+		print('Resuming from key {:#x}'.format(first), file=log)
+
+	t0 = last_checkpoint = time.perf_counter()
+	spaces = clipped_subspaces(first, stop)  # sub-spaces not yet reported as searched
+	done = {}          # lo -> hi of chunks finished above the watermark
+	watermark = first  # every key below it has been tried
+	found = None
+
+	def on_result(result):
+		nonlocal watermark, found, last_checkpoint
+		lo, hi, key = result
+		if key is not None:
+			found = key
+			return True
+		done[lo] = hi
+		while watermark in done:
+			watermark = done.pop(watermark)
+		while spaces and watermark >= spaces[0][2]:
+			print('Sub-space of {}-byte keys searched ({:.1f}s)'.format(spaces.pop(0)[0], time.perf_counter() - t0),
+				file=log)
+		now = time.perf_counter()
+		if checkpoint is not None and now - last_checkpoint >= CHECKPOINT_EVERY:
+			save_checkpoint(checkpoint, target, start, stop, watermark)
+			last_checkpoint = now
+		return False
+
+	try:
+		tested, elapsed = run_chunks(_search_chunk, plan_chunks(first, stop, chunk_size, workers), stop - start,
+			workers, _init_worker, (ciphertext, plaintext, mode, backend), on_result, log,
+			progress=lambda: watermark - start)
+	finally:
+		# also reached on Ctrl-C, so an interrupted run keeps its progress
+		if checkpoint is not None:
+			with sigint_deferred():
+				if found is None and watermark < stop:
+					save_checkpoint(checkpoint, target, start, stop, watermark)
+				elif os.path.exists(checkpoint):
+					os.remove(checkpoint)
+
+	print('Tried {:,} keys in {:.1f}s ({:,.0f} keys/s)'.format(tested, elapsed, tested / elapsed if elapsed else 0), file=log)
+	return found
+
+# --------------------------- Ciphertext-only search ---------------------------
+# Without a known plaintext every key is ranked by how much its decryption looks
+# like English text. A cascade of filters keeps the per-key cost close to the
+# known-plaintext mode: the first block of a whole batch of keys is decrypted
+# into one buffer and checked with NumPy (printable ASCII, then share of letters
+# and spaces); only the few survivors are decrypted in full and scored with
+# English quadgrams. The quadgram counts are compiled once into a dense
+# 26^4 table next to this file and memory-mapped, so every worker shares its
+# pages and scores with one array lookup per quadgram.
+
+BATCH = 4096          # keys whose first block is decrypted into one buffer
+MIN_LETTERS = 0.6     # share of letters and spaces required in the first block
+HERE = os.path.dirname(os.path.abspath(__file__))
+NGRAM_FILE = os.path.join(HERE, '..', '..', 'week1', 'normal', 'english_quadgrams.txt')
+
+# printable ASCII plus tab, newline and carriage return
+PRINTABLE = np.zeros(256, dtype=bool)
+PRINTABLE[32:127] = True
+PRINTABLE[[9, 10, 13]] = True
+LETTER_OR_SPACE = np.zeros(256, dtype=bool)
+LETTER_OR_SPACE[ord('A'):ord('Z') + 1] = True
+LETTER_OR_SPACE[ord('a'):ord('z') + 1] = True
+LETTER_OR_SPACE[ord(' ')] = True
+
+def compile_quadgrams(ngram_file, table_file):
+	"""Write the log10 probabilities of a 'QUAD count' file as a dense 26^4 float32 table, floor last."""
+	quads, counts = [], []
+	with open(ngram_file, 'r') as f:
+		for line in f:
+			parts = line.split()
+			if len(parts) == 2:
+				quads.append(parts[0].upper())
+				counts.append(int(parts[1]))
+	codes = np.frombuffer(''.join(quads).encode('ascii'), dtype=np.uint8).reshape(-1, 4) - ord('A')
+	counts = np.array(counts, dtype=np.float64)
+	total = counts.sum()
+	table = np.full(26 ** 4 + 1, np.log10(0.01 / total), dtype=np.float32)
+	table[codes.astype(np.intp) @ (26 ** 3, 26 ** 2, 26, 1)] = np.log10(counts / total)
+	# readers never see a partial table
+	tmp = table_file + '.{}.tmp'.format(os.getpid())
+	with open(tmp, 'wb') as f:
+		np.save(f, table)
+	os.replace(tmp, table_file)
+
+def load_quadgrams(ngram_file=NGRAM_FILE):
+	"""(table, floor) of ngram_file, memory-mapped from a .npy next to this file compiled on first use."""
+	table_file = os.path.join(HERE, os.path.splitext(os.path.basename(ngram_file))[0] + '.npy')
+	if not os.path.exists(table_file) or os.stat(table_file).st_mtime_ns < os.stat(ngram_file).st_mtime_ns:
+		compile_quadgrams(ngram_file, table_file)
+	data = np.load(table_file, mmap_mode='r')
+	return data[:-1], float(data[-1])
+
+def english_score(plain, table, floor):
+	"""Mean quadgram log-probability of the letters of plain (higher is more English)."""
+	# ASCII letters to codes 0..25 (lower case folded up); everything else wraps past 25
+	codes = (np.frombuffer(plain, dtype=np.uint8) | 0x20) - ord('a')
+	codes = codes[codes < 26].astype(np.intp)
+	if len(codes) < 4:
+		return floor
+	idx = ((codes[:-3] * 26 + codes[1:-2]) * 26 + codes[2:-1]) * 26 + codes[3:]
+	return float(table[idx].sum(dtype=np.float64)) / len(idx)
+
+def first_block_filter(blocks):
+	"""Mask of the rows of a (keys, 16) uint8 array that pass the cheap filters."""
+	ok = PRINTABLE[blocks].all(axis=1)
+	ok &= LETTER_OR_SPACE[blocks].mean(axis=1) >= MIN_LETTERS
+	return ok
+
+def _init_rank_worker(ciphertext, top, ngram_file, stop):
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+	_worker['ciphertext'] = bytes(ciphertext)
+	_worker['top'] = top
+	_worker['quadgrams'], _worker['floor'] = load_quadgrams(ngram_file)
+	_worker['stop'] = stop
+
+def _rank_chunk(lo, hi):
+	"""Best (score, key, plaintext) of keys lo..hi-1, at most top of them."""
+	ct, top, stop = _worker['ciphertext'], _worker['top'], _worker['stop']
+	quadgrams, floor = _worker['quadgrams'], _worker['floor']
+	block = ct[:BLOCK]
+	ecb = modes.ECB()
+	AES = algorithms.AES
+	# one row per key; the extra block leaves room for update_into's slack
+	buf = np.zeros((BATCH + 1) * BLOCK, dtype=np.uint8)
+	out = memoryview(buf)
+	best = []
+
+	for base in range(lo, hi, BATCH):
+		if stop.is_set():
+			break
+		n = min(BATCH, hi - base)
+		for i, key in enumerate(iter_keys(base, base + n)):
+			Cipher(AES(key), ecb).decryptor().update_into(block, out[i * BLOCK:(i + 2) * BLOCK])
+		for i in np.flatnonzero(first_block_filter(buf[:n * BLOCK].reshape(n, BLOCK))):
+			key = int_to_key(base + int(i))
+			plain = ciphersuite.dec(key, ct)
+			if not PRINTABLE[np.frombuffer(plain, dtype=np.uint8)].all():
+				continue
+			item = (english_score(plain, quadgrams, floor), key, plain)
+			if len(best) < top:
+				heapq.heappush(best, item)
+			else:
+				heapq.heappushpop(best, item)
+	return lo, hi, best
+
+def rank_keys(ciphertext, start=1, stop=2**24, top=10, workers=None, chunk_size=CHUNK, ngram_file=NGRAM_FILE,
+	log=sys.stderr):
+	"""Ciphertext-only search: the top keys of [start, stop) as (score, key, plaintext), best first.
+
+	Every key of the range is tried (there is no known plaintext to stop on);
+	chunks run sub-space by sub-space as in search().
+	"""
+	workers = workers or os.cpu_count()
+	# compile the table once, before the workers map it
+	load_quadgrams(ngram_file)
+	best = []
+
+	def on_result(result):
+		nonlocal best
+		best = heapq.nlargest(top, best + result[2])
+		return False
+
+	tested, elapsed = run_chunks(_rank_chunk, plan_chunks(start, stop, chunk_size, workers), stop - start, workers,
+		_init_rank_worker, (ciphertext, top, ngram_file), on_result, log,
+		note=lambda: ' best={:.3f}'.format(best[0][0] if best else float('nan')))
+	print('Ranked {:,} keys in {:.1f}s ({:,.0f} keys/s)'.format(tested, elapsed, tested / elapsed if elapsed else 0), file=log)
+	return best
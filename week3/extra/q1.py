@@ -1,37 +1,39 @@
+import os
 import ciphersuite_aesnotrand as ciphersuite
+import keysearch
 from binascii import hexlify, unhexlify
 import base64
 
-key = ciphersuite.gen() # ECB
-msg = 'Attack at dawn!!'
-cph = ciphersuite.enc(key, bytearray(msg,'ascii'))
+if __name__ == '__main__':
+	msg = 'Attack at dawn!!'
 
-f = open("weak_ciphertext", "wb")
-f.write(cph)
-f.close()
+	# O ciphertext só é gerado de novo se não existir, para que uma pesquisa
+	# interrompida possa continuar a partir do checkpoint
+	if not os.path.exists("weak_ciphertext"):
+		key = ciphersuite.gen() # ECB
+		cph = ciphersuite.enc(key, bytearray(msg,'ascii'))
 
-## 
-# Extend me to
-# 1 - Read ciphertext
-f = open("weak_ciphertext", "rb")
-file_data = f.read()
+		f = open("weak_ciphertext", "wb")
+		f.write(cph)
+		f.close()
 
-# Função auxiliar para gerar uma chave, dado um número inteiro
-def gen_key(val):
-	val_bytes = val.to_bytes((val.bit_length() + 7) // 8, 'big')
-	offset = len(val_bytes)
-	key_aux = bytearray(b'\x00' * (ciphersuite.KEYLEN-offset))
-	key_aux.extend(val_bytes)
-	return bytes(key_aux)
+	##
+	# Extend me to
+	# 1 - Read ciphertext
+	f = open("weak_ciphertext", "rb")
+	file_data = f.read()
+	f.close()
+
+	# 2 - Guess the key used
+	# Attack Brute-Force: Percorrer os números de 1 a (2**32) para tentar descobrir a chave,
+	# repartidos por todos os cores e testados 65536 de cada vez com o AES bitsliced (ver keysearch.py)
+	msg_bytearr = bytearray(msg,'ascii')
+	key_aux = keysearch.search(file_data, msg_bytearr, 1, 2**32 + 1, checkpoint="weak_ciphertext.checkpoint",
+		backend="bitslice")
 
-# 2 - Guess the key used
-# Attack Brute-Force: Percorrer os números de 1 a (2**32) para tentar descobrir a chave 
-msg_bytearr = bytearray(msg,'ascii')
-for i in range(1, (2**32 + 1)):
-	key_aux = gen_key(i)
-		
 	# 3 - Test the decryption
-	pln_txt = ciphersuite.dec(key_aux, file_data)
-	if (pln_txt == msg_bytearr):
+	if key_aux is not None:
+		pln_txt = ciphersuite.dec(key_aux, file_data)
 		print("Chave Encontrada: {};\nMensagem Original: {}".format(key_aux, pln_txt))
-		break
\ No newline at end of file
+	else:
+		print("Chave não encontrada")
@@ -1,24 +1,132 @@
 import os
 import subprocess
 
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher
+    from cryptography.hazmat.decrepit.ciphers.algorithms import ARC4
+except ImportError:  # optional: only needed for backend="openssl"
+    Cipher = ARC4 = None
+
+CHUNK_SIZE = 1 << 16  # bytes of keystream generated and XORed at a time
+
+# PRGA index i runs 1, 2, ..., 255, 0, 1, ...: slicing this instead of
+# computing (i + 1) % 256 per byte
+I_CYCLE = list(range(256)) * 2
+
+
+class RC4:
+    """RC4 stream cipher that keeps its state between calls.
+
+    The KSA runs once per key; encrypt/decrypt continue the keystream where the
+    previous call stopped, so a large input can be fed in chunks or through
+    io streams with constant memory. drop discards the first keystream bytes
+    (RC4-drop[n]) and reset() goes back to the state right after the KSA and
+    the drop, to start a new message with the same key without a new KSA.
+
+    backend="openssl" runs the same cipher in OpenSSL's RC4 (through the
+    cryptography package) for large files; the default is the Python PRGA below.
+    """
+
+    def __init__(self, key: bytes, drop: int = 0, backend: str = "python"):
+        if not 1 <= len(key) <= 256:
+            raise ValueError("RC4 key must be 1 to 256 bytes long")
+        if backend not in ("python", "openssl"):
+            raise ValueError(f"unknown backend {backend!r}")
+        if backend == "openssl" and ARC4 is None:
+            raise RuntimeError("backend='openssl' needs the cryptography package")
+        self.key = bytes(key)
+        self.drop = drop
+        self.backend = backend
+        if backend == "openssl":
+            self.reset()
+            return
+
+        # KSA
+        S = list(range(256))
+        j = 0
+        for i in range(256):
+            j = (j + S[i] + key[i % len(key)]) & 0xff
+            S[i], S[j] = S[j], S[i]
+        self.S, self.i, self.j = S, 0, 0
+        if drop:
+            self.keystream(drop)
+        self._start = (S[:], self.i, self.j)
+
+    def reset(self):
+        if self.backend == "openssl":
+            self._ctx = Cipher(ARC4(self.key), mode=None).encryptor()
+            if self.drop:
+                self._ctx.update(bytes(self.drop))
+            return
+        S, self.i, self.j = self._start
+        self.S = S[:]
+
+    def keystream(self, n: int) -> bytes:
+        """Next n keystream bytes (PRGA)."""
+        if self.backend == "openssl":
+            return self._ctx.update(bytes(n))
+        S, i, j = self.S, self.i, self.j
+        out = bytearray(n)
+        k = 0
+        while k < n:
+            # at most one lap of i per slice of I_CYCLE
+            start = (i + 1) & 0xff
+            for i in I_CYCLE[start:start + min(256, n - k)]:
+                si = S[i]
+                j = (j + si) & 0xff
+                sj = S[j]
+                S[i] = sj
+                S[j] = si
+                out[k] = S[(si + sj) & 0xff]
+                k += 1
+        self.i, self.j = i, j
+        return out
+
+    def process(self, data: bytes) -> bytes:
+        """XOR data with the next len(data) keystream bytes (encryption and decryption alike)."""
+        if self.backend == "openssl":
+            return self._ctx.update(data)
+        n = len(data)
+        ks = self.keystream(n)
+        # one big-integer XOR instead of a Python loop over the bytes
+        return (int.from_bytes(data, "little") ^ int.from_bytes(ks, "little")).to_bytes(n, "little")
+
+    encrypt = process
+    decrypt = process
+
+    def process_stream(self, src, dst, chunk_size: int = CHUNK_SIZE) -> int:
+        """Encrypt/decrypt the binary stream src into dst chunk by chunk; returns the byte count."""
+        buf = bytearray(chunk_size)
+        view = memoryview(buf)
+        total = 0
+        while True:
+            n = src.readinto(buf)
+            if not n:
+                break
+            dst.write(self.process(view[:n]))
+            total += n
+        return total
+
+
 def rc4(data: bytes, key: bytes) -> bytes:
-    # KSA
-    S = list(range(256))
-    j = 0
-    for i in range(256):
-        j = (j + S[i] + key[i % len(key)]) % 256
-        S[i], S[j] = S[j], S[i]
-
-    # PRGA
-    i = j = 0
-    result = bytearray()
-    for byte in data:
-        i = (i + 1) % 256
-        j = (j + S[i]) % 256
-        S[i], S[j] = S[j], S[i]
-        k = S[(S[i] + S[j]) % 256]
-        result.append(byte ^ k)
-    return bytes(result)
+    return RC4(key).process(data)
+
+
+def process_file(cipher: RC4, src_path: str, dst_path: str) -> int:
+    # every file starts a new message: rewind the keystream instead of a new KSA
+    cipher.reset()
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        return cipher.process_stream(src, dst)
+
+
+def files_match(path_a: str, path_b: str, chunk_size: int = CHUNK_SIZE) -> bool:
+    with open(path_a, "rb") as fa, open(path_b, "rb") as fb:
+        while True:
+            a, b = fa.read(chunk_size), fb.read(chunk_size)
+            if a != b:
+                return False
+            if not a:
+                return True
 
 
 def main():
@@ -32,39 +140,29 @@ def main():
     ssl_decrypted_from_ssl_by_python = "decrypted_from_ssl_by_python.txt"
     ssl_decrypted_from_python_file = "decrypted_from_python_by_ssl.txt"
 
+    cipher = RC4(key)
+
     # encrypt
-    with open(input_file, "rb") as f:
-        plaintext = f.read()
-    ciphertext = rc4(plaintext, key)
-    with open(encrypted_file, "wb") as f:
-        f.write(ciphertext)
+    process_file(cipher, input_file, encrypted_file)
     print(f"Encrypted '{input_file}' -> '{encrypted_file}'")
 
     # decrypt
-    with open(encrypted_file, "rb") as f:
-        encrypted_data = f.read()
-    decrypted = rc4(encrypted_data, key)
-    with open(decrypted_file, "wb") as f:
-        f.write(decrypted)
+    process_file(cipher, encrypted_file, decrypted_file)
     print(f"Decrypted '{encrypted_file}' -> '{decrypted_file}'")
 
     # verify
-    if plaintext == decrypted:
+    if files_match(input_file, decrypted_file):
         print("SUCCESS: Files match.")
     else:
         print("ERROR: Files differ.")
 
     # decrypt file encrypted by OpenSSL 
     if os.path.exists(ssl_encrypted_file):
-        with open(ssl_encrypted_file, "rb") as f:
-            ssl_encrypted_data = f.read()
-        ssl_decrypted = rc4(ssl_encrypted_data, key)
-        with open(ssl_decrypted_from_ssl_by_python, "wb") as f:
-            f.write(ssl_decrypted)
+        process_file(cipher, ssl_encrypted_file, ssl_decrypted_from_ssl_by_python)
         print(f"Decrypted '{ssl_encrypted_file}' -> '{ssl_decrypted_from_ssl_by_python}'")
 
         # verify
-        if plaintext == ssl_decrypted:
+        if files_match(input_file, ssl_decrypted_from_ssl_by_python):
             print("SUCCESS: Files match.")
         else:
             print("ERROR: Files differ.")
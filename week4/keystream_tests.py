@@ -0,0 +1,286 @@
+import os
+import sys
+import math
+import time
+import argparse
+
+import numpy as np
+
+# Streaming statistical battery for the keystream generators of this repo.
+#
+# The tests follow NIST SP 800-22 (monobit, runs, serial, approximate entropy)
+# and FIPS 140-1 / HAC 5.4.4 (poker, autocorrelation). Every statistic is a
+# function of counts, so keystream is consumed in fixed-size chunks: each
+# chunk updates the counters with whole-array NumPy operations and is dropped.
+# Memory is one chunk plus the counters, whatever the length of the stream.
+#
+# Bits are taken most significant first within each byte. Every bit-level
+# test here looks at most 16 bits ahead (serial m <= 9, lags <= 8), so all of
+# them are linear functions of one histogram: how often each pair of
+# consecutive bytes (b[t], b[t+1]) occurs. A chunk costs a single bincount of
+# 16-bit values; the last byte is held back to pair with the next chunk.
+#
+#   python keystream_tests.py rc4 --mb 64
+#   python keystream_tests.py aes-ctr --mb 256 --chunk-kb 4096
+
+CHUNK_SIZE = 1 << 20        # bytes of keystream per update
+PATTERN_BITS = 9            # overlapping m-bit pattern counts (serial m = 9, ApEn m = 8)
+LAGS = tuple(range(1, 9))   # autocorrelation shifts, in bits
+ALPHA = 0.01                # significance level of the report
+
+POPCOUNT = np.array([bin(v).count("1") for v in range(256)], dtype=np.int64)
+PAIRS = np.arange(1 << 16)  # pair value b[t] << 8 | b[t+1]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+
+# --------------------------- Special functions ---------------------------
+def igamc(a: float, x: float) -> float:
+    """Regularized upper incomplete gamma function Q(a, x) (Numerical Recipes 6.2)."""
+    if x <= 0:
+        return 1.0
+    lead = math.exp(-x + a * math.log(x) - math.lgamma(a))
+    if x < a + 1:
+        # series for P(a, x)
+        term = total = 1 / a
+        ap = a
+        for _ in range(10000):
+            ap += 1
+            term *= x / ap
+            total += term
+            if abs(term) < abs(total) * 1e-15:
+                break
+        return max(0.0, 1 - total * lead)
+    # continued fraction for Q(a, x), modified Lentz
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for i in range(1, 10000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return h * lead
+
+
+def normal_p(z: float) -> float:
+    """Two-sided p-value of a standard normal statistic."""
+    return math.erfc(abs(z) / math.sqrt(2))
+
+
+# --------------------------- Tests on counts ---------------------------
+def runs_test(n: int, ones: int, runs: int):
+    """(z, p-value) of the NIST runs test for n bits with this many ones and runs.
+
+    z is normalised so that normal_p(z) is NIST's
+    erfc(|V - 2n pi (1 - pi)| / (2 sqrt(2n) pi (1 - pi))).
+    """
+    pi = ones / n
+    if abs(pi - 0.5) >= 2 / math.sqrt(n):
+        return float("nan"), 0.0   # monobit prerequisite fails
+    z = (runs - 2 * n * pi * (1 - pi)) / (2 * math.sqrt(n) * pi * (1 - pi))
+    return z, normal_p(z)
+
+
+# --------------------------- Battery ---------------------------
+class Battery:
+    """Running byte-pair histogram of a keystream; feed chunks with update(), read results()."""
+
+    def __init__(self, pattern_bits: int = PATTERN_BITS, lags=LAGS):
+        if not 3 <= pattern_bits <= 9:
+            raise ValueError("pattern_bits must be between 3 and 9 (16-bit windows)")
+        if not 1 <= min(lags) <= max(lags) <= 8:
+            raise ValueError("autocorrelation lags must be 1 to 8 bits (16-bit windows)")
+        self.m = pattern_bits
+        self.lags = tuple(sorted(set(lags) | {1}))   # lag 1 also gives the runs test
+        self.nbytes = 0
+        self.pairs = np.zeros(1 << 16, dtype=np.int64)
+        self.head = None     # first byte, for the cyclic wrap of the pattern counts
+        self.tail = None     # last byte, waiting for its successor
+
+    def update(self, chunk: bytes):
+        x = np.frombuffer(chunk, dtype=np.uint8)
+        if len(x) == 0:
+            return
+        if self.head is None:
+            self.head = int(x[0])
+        else:
+            x = np.concatenate([np.array([self.tail], dtype=np.uint8), x])
+        self.nbytes += len(x) - (self.tail is not None)
+        if len(x) > 1:
+            pairs = (x[:-1].astype(np.uint16) << 8) | x[1:]
+            self.pairs += np.bincount(pairs, minlength=1 << 16)
+        self.tail = int(x[-1])
+
+    def _counts(self):
+        """(byte counts, cyclic m-bit pattern counts, differing bits per lag) of the stream so far."""
+        last = np.zeros(256, dtype=np.int64)
+        last[self.tail] = 1
+        byte_counts = self.pairs.reshape(256, 256).sum(axis=1) + last
+
+        # patterns wrap around to the start of the stream (NIST's cyclic extension):
+        # the last byte pairs with the first
+        cyclic = self.pairs.copy()
+        cyclic[self.tail << 8 | self.head] += 1
+        mask = (1 << self.m) - 1
+        patterns = np.zeros(mask + 1, dtype=np.int64)
+        for s in range(8):
+            # the pattern starting at bit s of b[t] is bits [s, s + m) of the pair, from the top
+            patterns += np.bincount((PAIRS >> (16 - s - self.m)) & mask, weights=cyclic,
+                                    minlength=mask + 1).astype(np.int64)
+
+        # autocorrelation is not cyclic: the last byte only pairs with itself
+        flips = np.zeros(len(self.lags), dtype=np.int64)
+        tail_bits = np.unpackbits(np.array([self.tail], dtype=np.uint8))
+        for k, d in enumerate(self.lags):
+            diff = ((PAIRS >> 8) ^ (PAIRS >> (8 - d))) & 0xff
+            flips[k] = self.pairs @ POPCOUNT[diff]
+            flips[k] += np.count_nonzero(tail_bits[:-d] ^ tail_bits[d:])
+        return byte_counts, patterns, flips
+
+    def results(self):
+        """[(test, statistic, p-value)] for everything counted so far."""
+        n = 8 * self.nbytes
+        if n < 128:
+            raise ValueError("at least 16 bytes are needed")
+        byte_counts, patterns, flips = self._counts()
+        ones = int(byte_counts @ POPCOUNT)
+        out = []
+
+        # Monobit (frequency)
+        s = 2 * ones - n
+        out.append(("monobit", s / math.sqrt(n), normal_p(s / math.sqrt(n))))
+
+        # Runs: the number of runs is 1 + the number of bit changes (lag-1 differences)
+        runs = 1 + int(flips[self.lags.index(1)])
+        out.append(("runs",) + runs_test(n, ones, runs))
+
+        # Poker over non-overlapping 4-bit blocks, chi-square with 15 degrees of freedom
+        by_nibbles = byte_counts.reshape(16, 16)
+        nibbles = by_nibbles.sum(axis=1) + by_nibbles.sum(axis=0)  # high and low nibbles
+        k = 2 * self.nbytes
+        x = 16 / k * float(nibbles @ nibbles) - k
+        out.append(("poker (m=4)", x, igamc(15 / 2, x / 2)))
+
+        # Serial and approximate entropy from the cyclic overlapping pattern counts
+        counts = {self.m: patterns}
+        for m in range(self.m - 1, self.m - 3, -1):
+            counts[m] = counts[m + 1].reshape(-1, 2).sum(axis=1)
+        psi = {m: (2 ** m) / n * float(c @ c) - n for m, c in counts.items()}
+        m = self.m
+        d1 = psi[m] - psi[m - 1]
+        d2 = psi[m] - 2 * psi[m - 1] + psi[m - 2]
+        out.append((f"serial (m={m}) d1", d1, igamc(2 ** (m - 2), d1 / 2)))
+        out.append((f"serial (m={m}) d2", d2, igamc(2 ** (m - 3), d2 / 2)))
+
+        def phi(c):
+            c = c[c > 0] / n
+            return float(c @ np.log(c))
+        m = self.m - 1
+        apen = phi(counts[m]) - phi(counts[m + 1])
+        chi2 = 2 * n * (math.log(2) - apen)
+        out.append((f"approximate entropy (m={m})", chi2, igamc(2 ** (m - 1), chi2 / 2)))
+
+        # Autocorrelation: differing bits out of n - d pairs, normal approximation
+        for d, a in zip(self.lags, flips):
+            z = 2 * (int(a) - (n - d) / 2) / math.sqrt(n - d)
+            out.append((f"autocorrelation (d={d})", z, normal_p(z)))
+        return out
+
+
+def run(chunks, nbytes: int, battery: Battery = None):
+    """Feed the first nbytes of an iterable of keystream chunks to a battery."""
+    battery = battery or Battery()
+    done = 0
+    for chunk in chunks:
+        chunk = chunk[:nbytes - done]
+        battery.update(chunk)
+        done += len(chunk)
+        if done >= nbytes:
+            break
+    return battery
+
+
+# --------------------------- Generators ---------------------------
+# each yields the keystream of one generator of the repo, chunk_size bytes at a time
+def rc4_chunks(key: bytes, chunk_size: int = CHUNK_SIZE, drop: int = 0, backend: str = "python"):
+    from exercise2 import RC4
+    cipher = RC4(key, drop, backend)
+    while True:
+        yield bytes(cipher.keystream(chunk_size))
+
+
+def fsr_chunks(chunk_size: int = CHUNK_SIZE):
+    """Keystream of week5/extra/ciphersuite_fsr.py: the encryption of zeros."""
+    sys.path.insert(0, os.path.join(ROOT, "week5", "extra"))
+    import ciphersuite_fsr
+    ciphersuite_fsr.gen()
+    # enc discards the unused end of its last 32-byte digest, so keep chunks whole digests
+    chunk_size = max(32, chunk_size - chunk_size % 32)
+    zeros = bytes(chunk_size)
+    while True:
+        yield bytes(ciphersuite_fsr.enc(zeros))
+
+
+def aes_ctr_chunks(key: bytes, chunk_size: int = CHUNK_SIZE, counter: int = 0):
+    """ciphersuite_aesnotrand (AES-ECB) applied to consecutive 128-bit counter blocks."""
+    sys.path.insert(0, os.path.join(ROOT, "week3", "extra"))
+    import ciphersuite_aesnotrand as ciphersuite
+    blocks = max(1, chunk_size // 16)
+    while True:
+        ctr = np.zeros((blocks, 2), dtype=">u8")
+        ctr[:, 1] = np.arange(counter, counter + blocks, dtype=np.uint64)
+        yield ciphersuite.enc(key, ctr.tobytes())
+        counter += blocks
+
+
+def urandom_chunks(chunk_size: int = CHUNK_SIZE):
+    while True:
+        yield os.urandom(chunk_size)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the statistical battery on a keystream generator.")
+    parser.add_argument("generator", choices=("rc4", "rc4-openssl", "fsr", "aes-ctr", "urandom"))
+    parser.add_argument("--mb", type=float, default=16, help="MiB of keystream to test")
+    parser.add_argument("--chunk-kb", type=int, default=CHUNK_SIZE >> 10)
+    parser.add_argument("--key", help="hex key for rc4/aes-ctr (random when omitted)")
+    parser.add_argument("--drop", type=int, default=0, help="RC4 keystream bytes to discard first")
+    args = parser.parse_args(argv)
+
+    chunk_size = args.chunk_kb << 10
+    key = bytes.fromhex(args.key) if args.key else os.urandom(16)
+    if args.generator.startswith("rc4"):
+        backend = "openssl" if args.generator == "rc4-openssl" else "python"
+        chunks = rc4_chunks(key, chunk_size, args.drop, backend)
+    elif args.generator == "fsr":
+        chunks = fsr_chunks(chunk_size)
+    elif args.generator == "aes-ctr":
+        chunks = aes_ctr_chunks(key, chunk_size)
+    else:
+        chunks = urandom_chunks(chunk_size)
+
+    nbytes = int(args.mb * (1 << 20))
+    start = time.perf_counter()
+    battery = run(chunks, nbytes)
+    elapsed = time.perf_counter() - start
+    print(f"{battery.nbytes} bytes of {args.generator} in {elapsed:.1f}s "
+          f"({battery.nbytes / elapsed / 1e6:.1f} MB/s)", file=sys.stderr)
+
+    for name, stat, p in battery.results():
+        verdict = "ok" if p >= ALPHA else "FAIL"
+        print(f"{name:28s} {stat:14.4f}  p = {p:.6f}  {verdict}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+
+# Batched RC4 for keystream bias measurements.
+#
+# The permutations of a batch of keys are the rows of one (N, 256) uint8
+# matrix, stored flat so that S[k, x] is S[256 * k + x]. Every KSA and PRGA
+# step is then a few NumPy operations on N-element vectors: index i is the
+# same for all keys, only j differs per row. Counts are kept as one
+# (positions, 256) histogram per process and merged at the end, so memory
+# depends on the batch size, never on the number of keys.
+#
+#   python rc4_batch.py --keys 10000000 --positions 16
+
+BATCH = 4096        # keys run together in one state matrix
+TASK_KEYS = 1 << 18 # keys per process-pool task
+
+
+def ksa(keys: np.ndarray) -> np.ndarray:
+    """(N, L) uint8 keys -> flat (N * 256) uint8 permutations after the KSA."""
+    keys = np.asarray(keys, dtype=np.uint8)
+    n, keylen = keys.shape
+    base = np.arange(n, dtype=np.intp) * 256
+    S = np.tile(np.arange(256, dtype=np.uint8), n)
+    j = np.zeros(n, dtype=np.uint8)
+    for i in range(256):
+        si = S[base + i]
+        j += si + keys[:, i % keylen]       # uint8 arithmetic wraps mod 256
+        sj_idx = base + j
+        S[base + i] = S[sj_idx]
+        S[sj_idx] = si
+    return S
+
+
+def prga(S: np.ndarray, length: int, drop: int = 0) -> np.ndarray:
+    """Next length keystream bytes of every permutation in S, as (N, length) uint8.
+
+    S is updated in place and the PRGA starts at i = j = 0, i.e. S must come
+    straight from ksa(); drop discards the first keystream bytes.
+    """
+    n = len(S) // 256
+    base = np.arange(n, dtype=np.intp) * 256
+    j = np.zeros(n, dtype=np.uint8)
+    out = np.empty((length, n), dtype=np.uint8)
+    for t in range(drop + length):
+        i = (t + 1) & 0xff
+        si = S[base + i]
+        j += si
+        sj_idx = base + j
+        sj = S[sj_idx]
+        S[base + i] = sj
+        S[sj_idx] = si
+        if t >= drop:
+            out[t - drop] = S[base + (si + sj)]
+    return out.T
+
+
+def keystreams(keys: np.ndarray, length: int, drop: int = 0) -> np.ndarray:
+    """First length keystream bytes (after drop) of each of the (N, L) keys."""
+    return prga(ksa(keys), length, drop)
+
+
+def add_counts(hist: np.ndarray, stream: np.ndarray):
+    """Add the bytes of an (N, positions) keystream matrix to a (positions, 256) histogram."""
+    positions = stream.shape[1]
+    # one bincount over position * 256 + byte
+    idx = stream.astype(np.intp) + np.arange(positions, dtype=np.intp) * 256
+    hist += np.bincount(idx.ravel(), minlength=positions * 256).reshape(positions, 256)
+
+
+def count_keystreams(nkeys: int, keylen: int, positions: int, drop: int = 0,
+                     seed=None, batch: int = BATCH) -> np.ndarray:
+    """(positions, 256) byte counts over the keystreams of nkeys random keys."""
+    rng = np.random.default_rng(seed)
+    hist = np.zeros((positions, 256), dtype=np.int64)
+    for done in range(0, nkeys, batch):
+        keys = rng.integers(0, 256, size=(min(batch, nkeys - done), keylen), dtype=np.uint8)
+        add_counts(hist, keystreams(keys, positions, drop))
+    return hist
+
+
+def _count_task(args):
+    return count_keystreams(*args)
+
+
+def measure(nkeys: int, keylen: int = 16, positions: int = 256, drop: int = 0,
+            workers: int = None, seed=None, batch: int = BATCH,
+            task_keys: int = TASK_KEYS) -> np.ndarray:
+    """Byte histogram per keystream position over nkeys random keys, on all cores.
+
+    Every task gets its own child of one SeedSequence, so a given seed gives
+    the same counts whatever the number of workers.
+    """
+    workers = workers or os.cpu_count()
+    sizes = [min(task_keys, nkeys - off) for off in range(0, nkeys, task_keys)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(n, keylen, positions, drop, s, batch) for n, s in zip(sizes, seeds)]
+    hist = np.zeros((positions, 256), dtype=np.int64)
+    if workers <= 1 or len(tasks) == 1:
+        for task in tasks:
+            hist += _count_task(task)
+        return hist
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # keep a bounded number of tasks in flight and merge as they finish
+        pending = set()
+        for task in tasks:
+            pending.add(pool.submit(_count_task, task))
+            if len(pending) >= 2 * workers:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    hist += fut.result()
+        for fut in pending:
+            hist += fut.result()
+    return hist
+
+
+def biases(hist: np.ndarray, top: int = 10):
+    """Most over-represented (position, byte) cells as (position, byte, probability * 256, z-score).
+
+    Positions are 1-based as in the literature (Z_2 is the second byte).
+    """
+    n = hist.sum(axis=1, keepdims=True)
+    p = 1 / 256
+    z = (hist - n * p) / np.sqrt(n * p * (1 - p))
+    best = np.argsort(z, axis=None)[::-1][:top]
+    rows, cols = np.unravel_index(best, z.shape)
+    return [(r + 1, c, hist[r, c] / n[r, 0] * 256, z[r, c]) for r, c in zip(rows, cols)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure RC4 keystream byte biases over many random keys.")
+    parser.add_argument("--keys", type=int, default=1 << 22, help="number of random keys")
+    parser.add_argument("--keylen", type=int, default=16)
+    parser.add_argument("--positions", type=int, default=16, help="keystream bytes counted per key")
+    parser.add_argument("--drop", type=int, default=0, help="keystream bytes discarded before counting")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("-o", "--output", help="save the (positions, 256) counts as .npy")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    hist = measure(args.keys, args.keylen, args.positions, args.drop, args.workers, args.seed)
+    elapsed = time.perf_counter() - start
+    print(f"{args.keys} keys x {args.positions} bytes in {elapsed:.1f}s "
+          f"({args.keys / elapsed:.0f} keys/s)", file=sys.stderr)
+    if args.output:
+        np.save(args.output, hist)
+
+    for pos, byte, ratio, z in biases(hist, args.top):
+        print(f"Z_{pos} = 0x{byte:02x}: {ratio:.4f}/256  (z = {z:.1f})")
+
+
+if __name__ == "__main__":
+    main()
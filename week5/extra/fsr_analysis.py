@@ -0,0 +1,177 @@
+# Functional-graph analysis and state recovery for ciphersuite_fsr
+#
+# x -> x^5 + x^4 + 1 mod 1009 maps the state space into itself, so every seed
+# walks a tail into one of a few cycles. All tail and cycle lengths come from
+# one pass over the graph. Since every 32-byte keystream block is
+# SHA-256(state) for one of only 1009 states, a reverse index from block to
+# state turns one known 32-byte plaintext block into the LFSR state, and the
+# cached orbit of that state into the rest of the keystream.
+#
+#   python fsr_analysis.py                 (graph summary)
+#   python fsr_analysis.py --demo 100000   (break a batch of random messages)
+import sys
+import time
+import argparse
+import numpy as np
+
+import ciphersuite_fsr as fsr
+
+P = fsr.P
+BLOCK = fsr.BLOCK
+
+# --------------------------- Graph ---------------------------
+def functional_graph():
+	"""(tail, cycle) int arrays: steps from each seed into its cycle, and that cycle's length.
+
+	Every state is walked once: a walk stops at the first state already
+	labelled or already on the current path, and the path is labelled
+	backwards from there.
+	"""
+	succ, _ = fsr.tables()
+	tail = np.full(P, -1, dtype=np.int64)
+	cycle = np.zeros(P, dtype=np.int64)
+	for start in range(P):
+		if tail[start] >= 0:
+			continue
+		path = []
+		on_path = {}
+		s = start
+		while tail[s] < 0 and s not in on_path:
+			on_path[s] = len(path)
+			path.append(s)
+			s = succ[s]
+		if tail[s] < 0:
+			# closed a new cycle: path[on_path[s]:] is the cycle
+			k = on_path[s]
+			for c in path[k:]:
+				tail[c], cycle[c] = 0, len(path) - k
+			path = path[:k]
+		for t in reversed(path):
+			tail[t], cycle[t] = tail[succ[t]] + 1, cycle[succ[t]]
+	return tail, cycle
+
+def predecessors():
+	"""States mapping to each state (the seeds a recovered state may come from)."""
+	succ, _ = fsr.tables()
+	preds = [[] for _ in range(P)]
+	for s in range(P):
+		preds[succ[s]].append(s)
+	return preds
+
+def summary():
+	tail, cycle = functional_graph()
+	lengths, seeds = np.unique(cycle, return_counts=True)
+	leaves = sum(1 for p in predecessors() if not p)
+	# cycles: cycle length -> number of seeds that end in a cycle of that length
+	return {"cycles": {int(k): int(v) for k, v in zip(lengths, seeds)}, "cyclic states": int((tail == 0).sum()),
+		"max tail": int(tail.max()), "mean tail": float(tail.mean()), "states without predecessor": leaves,
+		"longest keystream period (bytes)": int(cycle.max()) * BLOCK}
+
+# --------------------------- Reverse index ---------------------------
+class BlockIndex:
+	"""Keystream block -> state, as a dict and as a sorted array for batch lookups."""
+
+	def __init__(self):
+		_, blocks = fsr.tables()
+		self.by_block = {b: s for s, b in enumerate(blocks)}
+		if len(self.by_block) != P:
+			raise ValueError("two states share a keystream block")
+		self.blocks = np.frombuffer(b"".join(blocks), dtype=np.uint8).reshape(P, BLOCK)
+		# the first 8 bytes of a block are a search key; hits are confirmed on all 32
+		keys = self.blocks[:, :8].copy().view(">u8").ravel()
+		if len(np.unique(keys)) != P:
+			raise ValueError("two keystream blocks share their first 8 bytes")
+		self.order = np.argsort(keys)
+		self.keys = keys[self.order]
+
+	def state(self, block):
+		"""State whose keystream block this is, or None."""
+		return self.by_block.get(bytes(block))
+
+	def states(self, blocks):
+		"""States of (N, 32) uint8 blocks, -1 where a block is no keystream block."""
+		blocks = np.ascontiguousarray(blocks, dtype=np.uint8)
+		keys = blocks[:, :8].copy().view(">u8").ravel()
+		pos = np.minimum(np.searchsorted(self.keys, keys), P - 1)
+		states = self.order[pos]
+		found = (self.blocks[states] == blocks).all(axis=1)
+		return np.where(found, states, -1)
+
+_index = None
+
+def index():
+	"""The reverse index, built on first use."""
+	global _index
+	if _index is None:
+		_index = BlockIndex()
+	return _index
+
+# --------------------------- Recovery ---------------------------
+def recover(ciphertext, known):
+	"""(state after the first block, plaintext) of a message whose first 32 plaintext bytes are known.
+
+	One index lookup gives the state that produced the first block; the
+	cached orbit of that state gives the rest of the keystream. Both are None
+	when the first block is no keystream block.
+	"""
+	if len(known) < BLOCK or len(ciphertext) < BLOCK:
+		raise ValueError("a 32-byte known plaintext prefix is needed")
+	first = bytes(a ^ b for a, b in zip(ciphertext[:BLOCK], known[:BLOCK]))
+	state = index().state(first)
+	if state is None:
+		return None, None
+	rest, _ = fsr.crypt(state, ciphertext[BLOCK:])
+	return state, bytes(known[:BLOCK]) + bytes(rest)
+
+def recover_batch(ciphertexts, known):
+	"""Plaintexts of (N, L) uint8 ciphertexts with known (32,) or (N, 32) first plaintext blocks.
+
+	Returns (states, plaintexts): state -1 and an all-zero row where the
+	first block is not a keystream block. Messages starting in the same state
+	share one keystream, so at most 1009 keystreams are built whatever N is.
+	"""
+	c = np.asarray(ciphertexts, dtype=np.uint8)
+	n, length = c.shape
+	if length < BLOCK:
+		raise ValueError("a 32-byte known plaintext prefix is needed")
+	states = index().states(c[:, :BLOCK] ^ np.asarray(known, dtype=np.uint8))
+	plain = np.zeros_like(c)
+	ok = states >= 0
+	uniq, inverse = np.unique(states[ok], return_inverse=True)
+	_, blocks = fsr.tables()
+	streams = np.empty((len(uniq), length), dtype=np.uint8)
+	for row, s in enumerate(uniq):
+		# keystream of the message: the recovered block, then the orbit after it
+		streams[row, :BLOCK] = np.frombuffer(blocks[s], dtype=np.uint8)
+		streams[row, BLOCK:] = np.frombuffer(fsr.crypt(int(s), bytes(length - BLOCK))[0], dtype=np.uint8)
+	plain[ok] = c[ok] ^ streams[inverse]
+	return states, plain
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Analyse the ciphersuite_fsr state graph and recover states from known plaintext.")
+	parser.add_argument("--demo", type=int, metavar="N", help="encrypt N random messages and break them in one batch")
+	parser.add_argument("--length", type=int, default=256, help="message length of the demo")
+	args = parser.parse_args(argv)
+
+	for name, value in summary().items():
+		print("{}: {}".format(name, value))
+	if not args.demo:
+		return
+
+	rng = np.random.default_rng()
+	known = np.frombuffer(b"From: alice@example.org To: bob\n", dtype=np.uint8)
+	plain = rng.integers(0, 256, size=(args.demo, args.length), dtype=np.uint8)
+	plain[:, :BLOCK] = known
+	cipher = np.empty_like(plain)
+	for i, seed in enumerate(rng.integers(0, P, size=args.demo)):
+		cipher[i] = np.frombuffer(fsr.FSR(int(seed)).enc(plain[i].tobytes()), dtype=np.uint8)
+
+	start = time.perf_counter()
+	states, recovered = recover_batch(cipher, known)
+	elapsed = time.perf_counter() - start
+	print("Broke {}/{} messages of {} bytes in {:.3f}s".format(int((recovered == plain).all(axis=1).sum()),
+		args.demo, args.length, elapsed), file=sys.stderr)
+
+
+if __name__ == "__main__":
+	main()